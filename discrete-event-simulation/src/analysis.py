@@ -93,11 +93,12 @@ def _throughput(simulation_collection):
     ptype_tp = dict()
     for sim in simulation_collection:
         for ptype in ptypes:
-            for t in sim.process_stats[ptype]['throughput']:
+            throughput = sim.time_parameterized_process_stats.throughput(ptype)
+            for t in throughput:
                 try:
-                    ptype_tp[t].append(sim.process_stats[ptype]['throughput'][t])
+                    ptype_tp[t].append(throughput[t])
                 except KeyError:
-                    ptype_tp[t] = [sim.process_stats[ptype]['throughput'][t]]
+                    ptype_tp[t] = [throughput[t]]
 
     for ptype in ptype2throughputs:
         for t in ptype_tp:
@@ -117,8 +118,9 @@ def param_per_t(q, param):
 def _param_per_t(sims, param):
     aggregator = dict()
     for sim in sims:
-        for t in sim.time_parameterized_process_stats:
-            t_proc_stats = sim.time_parameterized_process_stats[t]
+        per_t = sim.time_parameterized_process_stats.per_t(param)
+        for t in per_t:
+            t_proc_stats = per_t[t]
             for ptype in ptypes:
                 try:
                     if isinstance(t_proc_stats[ptype][param], int):
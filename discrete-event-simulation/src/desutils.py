@@ -1,8 +1,21 @@
-import sys
-from math import log, floor
+import sys, os
+from math import log, floor, exp, lgamma
 import heapq
 import time
+import pickle
+import struct
+import zlib
+import mmap
+from array import array
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache
+from itertools import chain
 from reinforcement import AdaptivePreemptor
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def mean(x):
     if len(x) == 0:
@@ -12,25 +25,413 @@ def mean(x):
 def quick_ratio(a,b):
     return round((a/b)*100,2)
 
+def _betainc(a, b, x):
+    """
+    regularized incomplete beta function I_x(a, b), by its continued
+    fraction (Numerical Recipes, betacf)
+    """
+    if x <= 0 or x >= 1:
+        return float(x >= 1)
+    if x > (a + 1) / (a + b + 2):
+        return 1 - _betainc(b, a, 1 - x)
+    front = exp(lgamma(a + b) - lgamma(a) - lgamma(b) + a * log(x) + b * log(1 - x)) / a
+    tiny = 1e-300
+    c, d = 1, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    f = d
+    for m in range(1, 300):
+        for num in (m * (b - m) * x / ((a + 2*m - 1) * (a + 2*m)),
+                    -(a + m) * (a + b + m) * x / ((a + 2*m) * (a + 2*m + 1))):
+            d = 1 + num * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + num / c
+            c = c if abs(c) > tiny else tiny
+            f *= c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return front * f
+
+def student_t_quantile(p, df):
+    """
+    the p-quantile of Student's t distribution with df degrees of freedom
+    args:
+        :p (float) - probability in (0, 1)
+        :df (float) - degrees of freedom
+    """
+    def cdf(t):
+        tail = 0.5 * _betainc(df / 2, 0.5, df / (df + t * t))
+        return 1 - tail if t > 0 else tail
+    lo, hi = -1.0, 1.0
+    while cdf(lo) > p:
+        lo *= 2
+    while cdf(hi) < p:
+        hi *= 2
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if cdf(mid) < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+def confidence_interval(x, level=0.95):
+    """
+    Student t confidence interval for the mean of independent samples
+    args:
+        :x (list) - at least 2 samples
+        :level (float) - confidence level
+    returns:
+        :(mean, half width)
+    """
+    n = len(x)
+    m = mean(x)
+    var = sum((xi - m) ** 2 for xi in x) / (n - 1)
+    return m, student_t_quantile(1 - (1 - level) / 2, n - 1) * (var / n) ** 0.5
+
+# checkpoint file layout: MAGIC | version (u16) | payload length (u64) | zlib'd pickle
+CHECKPOINT_MAGIC = b'DESCKPT\x00'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_HEADER = struct.Struct('<HQ')
+
+def save_checkpoint(path, state):
+    """
+    write a checkpoint; the file is replaced atomically so a crash
+    mid-write leaves the previous checkpoint intact
+    args:
+        :path (str) - where to write the checkpoint
+        :state (dict) - whatever is needed to resume, see simulator.main
+    """
+    payload = zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL), 1)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as ckpt:
+        ckpt.write(CHECKPOINT_MAGIC)
+        ckpt.write(CHECKPOINT_HEADER.pack(CHECKPOINT_VERSION, len(payload)))
+        ckpt.write(payload)
+    os.replace(tmp, path)
+
+def load_checkpoint(path):
+    """
+    read a checkpoint written by save_checkpoint
+    raises:
+        :ValueError if the file isn't a checkpoint or has an unknown version
+    """
+    with open(path, 'rb') as ckpt:
+        if ckpt.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f'{path} is not a simulator checkpoint')
+        version, length = CHECKPOINT_HEADER.unpack(ckpt.read(CHECKPOINT_HEADER.size))
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f'{path} has checkpoint version {version}, expected {CHECKPOINT_VERSION}')
+        payload = ckpt.read(length)
+    if len(payload) != length:
+        raise ValueError(f'{path} is truncated')
+    return pickle.loads(zlib.decompress(payload))
+
+class Checkpointer(object):
+    def __init__(self, path, every=None, seconds=None):
+        """
+        Decides when to checkpoint a running simulation and writes the
+        checkpoints without holding up the event loop: where os.fork is
+        available the state is serialized by a forked child working on a
+        copy-on-write snapshot, so the parent only pays for the fork.
+
+        args:
+            :path (str) - checkpoint file, overwritten each time
+            :every (int) - checkpoint every `every` events
+            :seconds (float) - checkpoint every `seconds` of wall time
+        """
+        self.path = path
+        self.every = every
+        self.seconds = seconds
+        self._next_event = every
+        self._next_time = time.monotonic() + seconds if seconds else None
+        self._child = None
+        self.written = 0
+
+    def due(self, events):
+        """
+        whether a checkpoint is due after `events` events
+        """
+        if self._next_event is not None and events >= self._next_event:
+            return True
+        # only look at the clock every so often
+        if self._next_time is not None and events % 1024 == 0:
+            return time.monotonic() >= self._next_time
+        return False
+
+    def write(self, events, state):
+        """
+        checkpoint `state`, taken after `events` events; if the previous
+        checkpoint is still being written this one is skipped
+        """
+        if self.every:
+            self._next_event = events + self.every
+        if self.seconds:
+            self._next_time = time.monotonic() + self.seconds
+        if self._busy():
+            return
+        if not hasattr(os, 'fork'):
+            save_checkpoint(self.path, state)
+            self.written += 1
+            return
+        pid = os.fork()
+        if pid == 0:
+            try:
+                save_checkpoint(self.path, state)
+            except BaseException:
+                os._exit(1)
+            os._exit(0)
+        self._child = pid
+        self.written += 1
+
+    def _busy(self):
+        if self._child is None:
+            return False
+        pid, _ = os.waitpid(self._child, os.WNOHANG)
+        if pid == 0:
+            return True
+        self._child = None
+        return False
+
+    def finish(self):
+        """
+        wait for a checkpoint that is still being written
+        """
+        if self._child is not None:
+            os.waitpid(self._child, 0)
+            self._child = None
+
+# event trace layout: header (TRACE_HEADER_SIZE bytes) | records
+#   header: MAGIC | version (u16) | record size (u16) | record count (u64) | process type names ('\n' joined)
+#   record: t (i64) | pid (i64) | quantum (i32, -1 for none) | cpu (i16, -1 for none) | event type (u8) | ptype id (u8)
+#   the count is only filled in by close(); quantum is never 0, so the unused space of a
+#   trace that wasn't closed is told apart from records by its zero quantum
+TRACE_MAGIC = b'DESTRACE'
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct('<HHQ')
+TRACE_HEADER_SIZE = 256
+TRACE_RECORD = struct.Struct('<qqihBB')
+TRACE_BATCH = 4096
+TRACE_FIELDS = [('t', '<i8'), ('pid', '<i8'), ('quantum', '<i4'), ('cpu', '<i2'), ('type', 'u1'), ('ptype', 'u1')]
+
+class EventTrace(object):
+    def __init__(self, path, process_types, capacity=1 << 16):
+        """
+        Binary trace of handled events: fixed size records written into a
+        memory-mapped file, which doubles in size whenever it fills up and
+        is cut down to what was written by close(). Read it back with
+        read_trace.
+
+        Records are buffered and packed into the file TRACE_BATCH at a time
+        rather than one pack_into per event; collecting an event's fields
+        still costs about 0.5us, so tracing adds roughly 5-15% to a run.
+        A trace that is never closed loses the buffered records.
+
+        Pickling flushes the buffer and keeps the path and the number of
+        records written but not the mapping; reopen() carries on writing
+        after those records.
+        args:
+            :path (str) - trace file, overwritten
+            :process_types (list) - process type names; a record's ptype is an index into it
+            :capacity (int) - records the file has room for initially
+        """
+        self.path = path
+        self.process_types = list(process_types)
+        self._ptype_ids = {ptype:i for i, ptype in enumerate(self.process_types)}
+        self.count = 0
+        self._pending = []
+        names = '\n'.join(self.process_types).encode()
+        if len(TRACE_MAGIC) + TRACE_HEADER.size + len(names) > TRACE_HEADER_SIZE:
+            raise ValueError('process type names do not fit in the trace header')
+        with open(path, 'wb') as trace:
+            trace.write(TRACE_MAGIC + TRACE_HEADER.pack(TRACE_VERSION, TRACE_RECORD.size, 0) + names)
+            trace.truncate(TRACE_HEADER_SIZE + capacity * TRACE_RECORD.size)
+        self._map()
+
+    def _map(self):
+        self._file = open(self.path, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._pack = _trace_batch(TRACE_BATCH).pack_into
+        self._end = len(self._mm)
+        self._offset = TRACE_HEADER_SIZE + self.count * TRACE_RECORD.size
+
+    def _grow(self):
+        self._mm.close()
+        self._file.truncate(2 * self._end - TRACE_HEADER_SIZE)
+        self._file.close()
+        self._map()
+
+    def write(self, e):
+        """
+        append a record for event e
+        """
+        p = e.p
+        q, cpu = p.QUANTUM, p.cpu
+        pending = self._pending
+        pending.append((e.t, p.pid, -1 if q is None else q, -1 if cpu is None else cpu.id,
+                        e.type, self._ptype_ids[p.type]))
+        if len(pending) == TRACE_BATCH:
+            self.flush()
+
+    def flush(self):
+        """
+        pack the buffered records into the file
+        """
+        n = len(self._pending)
+        if not n:
+            return
+        size = n * TRACE_RECORD.size
+        while self._offset + size > self._end:
+            self._grow()
+        pack = self._pack if n == TRACE_BATCH else _trace_batch(n).pack_into
+        pack(self._mm, self._offset, *chain.from_iterable(self._pending))
+        self._pending.clear()
+        self._offset += size
+        self.count += n
+
+    @property
+    def closed(self):
+        return self._mm is None
+
+    def close(self):
+        """
+        record the number of records in the header and drop the unused space
+        """
+        if self.closed:
+            return
+        self.flush()
+        TRACE_HEADER.pack_into(self._mm, len(TRACE_MAGIC), TRACE_VERSION, TRACE_RECORD.size, self.count)
+        self._mm.close()
+        self._file.truncate(self._offset)
+        self._file.close()
+        self._mm = self._file = None
+
+    def reopen(self):
+        """
+        carry on writing a trace that was pickled while open, after the
+        records it had written by then
+        """
+        if self.closed:
+            self._map()
+
+    def __getstate__(self):
+        if not self.closed:
+            self.flush()
+        state = self.__dict__.copy()
+        state['_mm'] = state['_file'] = state['_pack'] = None
+        state['_pending'] = []
+        return state
+
+@lru_cache(maxsize=None)
+def _trace_batch(n):
+    """
+    struct for n consecutive trace records
+    """
+    return struct.Struct('<' + n * TRACE_RECORD.format.lstrip('<'))
+
+def read_trace(path):
+    """
+    map an event trace written by EventTrace into a numpy structured
+    array (fields t, pid, quantum, cpu, type, ptype) without copying it
+    returns:
+        :(records, process types), where records['ptype'] indexes process types
+    raises:
+        :ValueError if the file isn't an event trace or has an unknown version
+    """
+    if np is None:
+        raise ImportError('read_trace requires numpy')
+    with open(path, 'rb') as trace:
+        header = trace.read(TRACE_HEADER_SIZE)
+    if header[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+        raise ValueError(f'{path} is not an event trace')
+    version, record_size, count = TRACE_HEADER.unpack_from(header, len(TRACE_MAGIC))
+    if version != TRACE_VERSION or record_size != TRACE_RECORD.size:
+        raise ValueError(f'{path} has trace version {version}, expected {TRACE_VERSION}')
+    names = header[len(TRACE_MAGIC) + TRACE_HEADER.size:].rstrip(b'\x00').decode()
+    size = (os.path.getsize(path) - TRACE_HEADER_SIZE) // record_size
+    if size == 0:
+        return np.zeros(0, dtype=TRACE_FIELDS), names.split('\n')
+    records = np.memmap(path, dtype=np.dtype(TRACE_FIELDS), mode='r', offset=TRACE_HEADER_SIZE, shape=(size,))
+    if count == 0:
+        # never closed; the records stop where the unused space starts
+        unused = np.flatnonzero(records['quantum'] == 0)
+        count = unused[0] if len(unused) else size
+    return records[:count], names.split('\n')
+
+def derive_seed(seed, stream):
+    """
+    derive a 48-bit seed for stream number `stream` from a base seed
+    (splitmix64 finalizer); nearby inputs give unrelated seeds, so each
+    trial gets its own stream no matter which process runs it
+    args:
+        :seed (int) - the base seed
+        :stream (int) - index of the stream, e.g. the trial number
+    """
+    mask = 2**64 - 1
+    z = (seed + (stream + 1) * 0x9E3779B97F4A7C15) & mask
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & mask
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & mask
+    return (z ^ (z >> 31)) & (2**48 - 1)
+
+# rand48: n' = (A * n + C) mod 2**48
+RAND48_A = 25214903917
+RAND48_C = 11
+RAND48_MASK = 2**48 - 1
+# distance between spawned streams; 4096 streams of 2**36 draws each fit in the period
+SPAWN_STRIDE = 2**36
+SPAWN_STREAMS = 2**48 // SPAWN_STRIDE
+# distance between the common random number substreams of one stream;
+# 256 of them fit before the next stream, the first being the stream itself
+SUBSTREAM_STRIDE = 2**28
+SUBSTREAMS = SPAWN_STRIDE // SUBSTREAM_STRIDE - 1
+
 class RandomNumberGenerator(object):
-    def __init__(self, seed=None):
+    # jump tables (A**k, C*(A**(k-1) + ... + 1)) mod 2**48 for k = 1..size, by size
+    _tables = {}
+    # defaults for generators pickled before buffering existed
+    buffer = 0
+    antithetic = False
+    _block = ()
+    _pos = 0
+
+    def __init__(self, seed=None, buffer=0, antithetic=False):
         """
         - Implements the Rand48 functions necessary for this system
         - adapted from 
            [https://stackoverflow.com/questions/7287014/is-there-any-drand48-equivalent-in-python-or-a-wrapper-to-it]
         - Note that rand48 family of functions were declared obsolete in 1989 by SVI3
+        args:
+            :seed (int) - initial state; the current time if None
+            :buffer (int) - if > 0, generate this many values at a time
+                            (with numpy when available) and serve draws from
+                            the block; the sequence is identical either way
+            :antithetic (bool) - draw 1 - u (less one step, to stay in [0, 1))
+                                 wherever the generator would draw u
         """
-        if seed:
+        if seed is not None:
             self.n = seed
         else:
             self.n = int(time.time())
         self.override = False
+        self.buffer = buffer
+        self.antithetic = antithetic
+        self._block = []
+        self._pos = 0
 
     def seed(self, seed):
         self.n = seed
+        self._block, self._pos = [], 0
 
     def srand(self, seed):
-        self.n = (seed << 16) + 0x330e
+        self.seed((seed << 16) + 0x330e)
+
+    @property
+    def state(self):
+        """
+        the LCG state after the last value drawn
+        """
+        if self._pos < len(self._block):
+            return self._block[self._pos - 1] if self._pos else self.n
+        return self.n
 
     def override_rand(self, rng):
         """
@@ -41,15 +442,129 @@ class RandomNumberGenerator(object):
         self.override = True
         self.rng = rng
 
+    @staticmethod
+    def _jump(steps):
+        """
+        the (multiplier, increment) that advance the LCG `steps` values in
+        one step, by squaring the one-step map; O(log steps)
+        """
+        a, c = 1, 0
+        sq_a, sq_c = RAND48_A, RAND48_C
+        while steps:
+            if steps & 1:
+                a, c = (sq_a * a) & RAND48_MASK, (sq_a * c + sq_c) & RAND48_MASK
+            sq_a, sq_c = (sq_a * sq_a) & RAND48_MASK, (sq_a * sq_c + sq_c) & RAND48_MASK
+            steps >>= 1
+        return a, c
+
+    def jump(self, steps):
+        """
+        skip the next `steps` values
+        args:
+            :steps (int)
+        """
+        a, c = self._jump(steps % 2**48)
+        self.seed((a * self.state + c) & RAND48_MASK)
+
+    def jumped(self, steps):
+        """
+        a new generator positioned `steps` values ahead of this one
+        args:
+            :steps (int)
+        """
+        rng = RandomNumberGenerator(buffer=self.buffer, antithetic=self.antithetic)
+        rng.seed(self.state)
+        rng.jump(steps)
+        return rng
+
+    def spawn(self, k, stride=SPAWN_STRIDE):
+        """
+        k generators whose streams start `stride`, 2*`stride`, ... values
+        ahead of this one, so none of them overlap (nor this one) for
+        `stride` draws; this generator is not advanced
+        args:
+            :k (int) - number of generators
+            :stride (int) - distance between streams
+        """
+        return [self.jumped(i * stride) for i in range(1, k + 1)]
+
+    @classmethod
+    def _table(cls, size):
+        if size not in cls._tables:
+            a, c, mult, inc = [], [], 1, 0
+            for _ in range(size):
+                mult = (RAND48_A * mult) & RAND48_MASK
+                inc = (RAND48_A * inc + RAND48_C) & RAND48_MASK
+                a.append(mult)
+                c.append(inc)
+            if np is not None:
+                a, c = np.array(a, dtype=np.uint64), np.array(c, dtype=np.uint64)
+            cls._tables[size] = (a, c)
+        return cls._tables[size]
+
+    def _states(self, start, size):
+        """
+        the `size` states following `start`; every state is computed
+        directly from `start` so numpy can do them all at once
+        (uint64 arithmetic wraps mod 2**64, which 2**48 divides)
+        """
+        a, c = self._table(size)
+        if np is None:
+            return [(ai * start + ci) & RAND48_MASK for ai, ci in zip(a, c)]
+        return (a * np.uint64(start) + c) & np.uint64(RAND48_MASK)
+
+    def _fill(self):
+        block = self._states(self.n, self.buffer)
+        self._block = block if np is None else block.tolist()
+        self._pos = 0
+        self.n = self._block[-1]
+
     def _next(self):
-        self.n  = (25214903917 * self.n + 11) & (2**48 - 1)
+        if self.buffer:
+            if self._pos == len(self._block):
+                self._fill()
+            self._pos += 1
+            return self._block[self._pos - 1]
+        self.n  = (RAND48_A * self.n + RAND48_C) & RAND48_MASK
         return self.n
     
     def drand(self):
         if not self.override:
+            if self.antithetic:
+                return (RAND48_MASK - self._next())/ 2**48
             return self._next()/ 2**48
         return self.rng()
 
+    def drand_many(self, size):
+        """
+        the next `size` values of drand as a numpy array
+        args:
+            :size (int)
+        """
+        if np is None:
+            raise ImportError('drand_many requires numpy')
+        if self.override:
+            return np.fromiter((self.rng() for _ in range(size)), dtype=np.float64, count=size)
+        # use up what is left of the current block first
+        left = self._block[self._pos:self._pos + size]
+        self._pos += len(left)
+        chunks = [np.array(left, dtype=np.uint64)]
+        size -= len(left)
+        start = self.state
+        step = max(self.buffer, 4096)
+        while size > 0:
+            chunk = self._states(start, min(step, size))
+            chunks.append(chunk)
+            start = int(chunk[-1])
+            size -= len(chunk)
+        if len(chunks) > 1:
+            # the block (if any) is exhausted, so the state lives in self.n again
+            self._block, self._pos, self.n = [], 0, start
+        states = np.concatenate(chunks)
+        if self.antithetic:
+            states = np.uint64(RAND48_MASK) - states
+        return states.astype(np.float64) / 2**48
+
     def exprand(self, beta):
         """
         draw from an exponential distribution centered at beta
@@ -63,6 +578,22 @@ class RandomNumberGenerator(object):
         rtnval = 1 + int(floor(t))
         return rtnval
 
+    def exprand_many(self, beta, size):
+        """
+        the next `size` values of exprand as a numpy array
+        args:
+            :beta (float) - mean of exponential dist. to draw from
+            :size (int)
+        """
+        r = self.drand_many(size)
+        t = -np.log(1 - r) * (beta - 0.5)
+        out = 1 + np.floor(t).astype(np.int64)
+        # np.log may be an ulp away from math.log; redo the draws that
+        # land next to an integer so the result matches exprand exactly
+        for i in np.flatnonzero(np.abs(t - np.rint(t)) <= 1e-12 * np.maximum(1, np.abs(t))):
+            out[i] = 1 + int(floor(-log(1 - r[i]) * (beta - 0.5)))
+        return out
+
     def urand(self, a, b):
         """
         return a number drawn uniformly from the interval [a,b]
@@ -79,11 +610,23 @@ class RandomNumberGenerator(object):
         c = self.drand() * (b - a) + a
         return int(round(c))
 
+    def urand_many(self, a, b, size):
+        """
+        the next `size` values of urand as a numpy array
+        (np.rint rounds half to even, as round does)
+        args:
+            :a, b - floats; a < b
+            :size (int)
+        """
+        assert a < b
+        return np.rint(self.drand_many(size) * (b - a) + a).astype(np.int64)
+
 class Process(object):
     __slots__ = ['type','burst_cpu','burst_io',
                  'demand','cpu_current','arrival_time',
                  'wait_time','num_preemptions','pid',
-                 'cpu','QUANTUM','last_quantum']
+                 'cpu','QUANTUM','last_quantum','ready_since',
+                 'run_quanta']
 
     def __init__(self, **proc_attrs):
         """
@@ -105,6 +648,10 @@ class Process(object):
             :wait_time (int) - length of time spent in ready queue
             :num_preemptions (int) - amount of time kicked off of CPU
             :pid (int) - process id
+            :ready_since (int) - time the process last entered the ready queue;
+                                 its wait is added to wait_time when it leaves
+            :run_quanta (int) - back to back quanta covered by the pending
+                                TIME_SLICE_EXPIRED (> 1 only in fast-forward mode)
         """
         for attr in proc_attrs:
             setattr(self, attr, proc_attrs[attr])
@@ -120,6 +667,8 @@ class Process(object):
                 setattr(self, attr, 0)
         self.cpu = None
         self.last_quantum = 0
+        self.ready_since = None
+        self.run_quanta = 1
 
     def __eq__(self, proc):
         if isinstance(proc, Process):
@@ -139,12 +688,21 @@ class Process(object):
         return None
 
 class Event(object):
-    PROCESS_SUBMITTED  = 'PROCESS_SUBMITTED'
-    PROCESS_DISPATCHED = 'PROCESS_DISPATCHED'
-    PROCESS_TERMINATED = 'PROCESS_TERMINATED'
-    TIME_SLICE_EXPIRED = 'TIME_SLICE_EXPIRED'
-    IO_REQUEST         = 'IO_REQUEST'
-    IO_COMPLETE        = 'IO_COMPLETE'
+    __slots__ = ['type','t','p']
+
+    # event types are small integer codes; NAMES[code] is the printable name
+    PROCESS_SUBMITTED  = 0
+    PROCESS_DISPATCHED = 1
+    PROCESS_TERMINATED = 2
+    TIME_SLICE_EXPIRED = 3
+    IO_REQUEST         = 4
+    IO_COMPLETE        = 5
+    NAMES = ['PROCESS_SUBMITTED',
+             'PROCESS_DISPATCHED',
+             'PROCESS_TERMINATED',
+             'TIME_SLICE_EXPIRED',
+             'IO_REQUEST',
+             'IO_COMPLETE']
 
     def __init__(self, etype, t, proc):
         """
@@ -153,7 +711,8 @@ class Event(object):
         of event.
 
         args:
-            :etype (str) - the event occurring
+            :etype (int) - the event occurring, one of the codes above
+                           or one handed out by Event.register_type
             :t (int) - the timestep the event takes place at
             :proc (Process) - the process that this event involves
         """
@@ -162,12 +721,26 @@ class Event(object):
         self.p    = proc
         
     def __str__(self):
-        summary = "t={0:5d} {1:>20s} {3:>5s}{2:04d}".format(self.t,self.type,self.p.pid,'pid=')
+        summary = "t={0:5d} {1:>20s} {3:>5s}{2:04d}".format(self.t,Event.NAMES[self.type],self.p.pid,'pid=')
 
         if self.type == Event.PROCESS_TERMINATED:
             summary += " waitTime={}".format(self.p.wait_time)
         return summary # + " " + str(self.p.cpu) #+ ' [{}]'.format(str(self.p))
 
+    @classmethod
+    def register_type(cls, name):
+        """
+        add a new kind of event, e.g. a timer tick or device interrupt
+        args:
+            :name (str) - printable name of the event type
+        returns:
+            :(int) the code for the event type; registering an existing
+             name returns the code it already has
+        """
+        if name not in cls.NAMES:
+            cls.NAMES.append(name)
+        return cls.NAMES.index(name)
+
     def __lt__(self, t):
         return self.t < t
 
@@ -180,11 +753,287 @@ class Event(object):
     def __ge__(self, t):
         return self.t >= t
 
+class EventQueue(object):
+    def __init__(self):
+        """
+        A binary heap of Events keyed on their timestep.
+
+        Events that share a timestep come out in the order they
+        were pushed; each entry carries an insertion sequence number
+        that breaks ties so the heap never has to compare Events.
+
+        attributes:
+            :_heap (list) - heap of (t, seq, Event) entries
+            :_seq (int) - number of events pushed so far
+        """
+        self._heap = []
+        self._seq = 0
+
+    def push(self, e):
+        """
+        push an event onto the heap
+        args:
+            :e (Event) - event with priority e.t
+        """
+        heapq.heappush(self._heap, (e.t, self._seq, e))
+        self._seq += 1
+
+    def pop(self):
+        """
+        pop the earliest event off of the heap
+        raises:
+            :IndexError if the queue is empty
+        """
+        return heapq.heappop(self._heap)[2]
+
+    def peek(self):
+        """
+        return the earliest event without removing it; None if empty
+        """
+        if self._heap:
+            return self._heap[0][2]
+        return None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        return (entry[2] for entry in sorted(self._heap))
+
+class CalendarEventQueue(object):
+    def __init__(self, days=1024):
+        """
+        A calendar queue of Events keyed on their (integer) timestep.
+
+        The calendar is a ring of `days` FIFO buckets, each one tick wide,
+        covering the window [now, now + days). An event inside the window
+        is appended to the bucket for its timestep, so enqueue and dequeue
+        are O(1) amortized; events past the window wait in an overflow heap
+        and are moved into the ring as the window slides over them.
+        Events that share a timestep come out in the order they were pushed,
+        exactly as they do from EventQueue.
+
+        args:
+            :days (int) - number of buckets in the ring, i.e. how far
+                          ahead of the current time an event can be placed
+                          without going through the overflow heap
+        """
+        self._days = days
+        self._buckets = [deque() for _ in range(days)]
+        self._now = 0           # timestep of the bucket under the cursor
+        self._in_ring = 0       # number of events held in the ring
+        self._overflow = []     # heap of (t, seq, Event) beyond the window
+        self._seq = 0
+
+    def push(self, e):
+        """
+        push an event onto the calendar
+        args:
+            :e (Event) - event with priority e.t
+        raises:
+            :ValueError if e.t is earlier than the last popped timestep
+        """
+        if e.t < self._now:
+            raise ValueError(f'Cannot schedule an event at t={e.t} before t={self._now}')
+        if e.t < self._now + self._days:
+            self._buckets[e.t % self._days].append(e)
+            self._in_ring += 1
+        else:
+            heapq.heappush(self._overflow, (e.t, self._seq, e))
+            self._seq += 1
+
+    def _advance(self):
+        """
+        move the cursor to the next nonempty bucket, pulling overflow
+        events into the ring as the window passes over them
+        """
+        if not self._in_ring:
+            # nothing in the ring; jump straight to the earliest overflow event
+            self._now = self._overflow[0][0]
+            self._migrate()
+            return
+        while not self._buckets[self._now % self._days]:
+            self._now += 1
+            self._migrate()
+
+    def _migrate(self):
+        horizon = self._now + self._days
+        while self._overflow and self._overflow[0][0] < horizon:
+            e = heapq.heappop(self._overflow)[2]
+            self._buckets[e.t % self._days].append(e)
+            self._in_ring += 1
+
+    def pop(self):
+        """
+        pop the earliest event off of the calendar
+        raises:
+            :IndexError if the queue is empty
+        """
+        if not self._in_ring and not self._overflow:
+            raise IndexError('pop from an empty event queue')
+        self._advance()
+        self._in_ring -= 1
+        return self._buckets[self._now % self._days].popleft()
+
+    def peek(self):
+        """
+        return the earliest event without removing it; None if empty
+        """
+        if not self._in_ring:
+            return self._overflow[0][2] if self._overflow else None
+        # scan without moving the cursor; events may still be pushed
+        # anywhere from the current time onwards
+        t = self._now
+        while not self._buckets[t % self._days]:
+            t += 1
+        return self._buckets[t % self._days][0]
+
+    def __len__(self):
+        return self._in_ring + len(self._overflow)
+
+    def __iter__(self):
+        ring = sorted((e for bucket in self._buckets for e in bucket), key=lambda e:e.t)
+        return iter(ring + [entry[2] for entry in sorted(self._overflow)])
+
+class FIFOReadyQueue(object):
+    def __init__(self, process_types=()):
+        """
+        First come, first served ready queue backed by a deque;
+        push and pop are both O(1).
+
+        args:
+            :process_types (iterable) - unused; accepted so every ready
+                                        queue can be built the same way
+        """
+        self._procs = deque()
+
+    def push(self, p):
+        self._procs.append(p)
+
+    def pop(self):
+        return self._procs.popleft()
+
+    def __len__(self):
+        return len(self._procs)
+
+    def __iter__(self):
+        return iter(self._procs)
+
+class PriorityReadyQueue(object):
+    def __init__(self, process_types=()):
+        """
+        Ready queue backed by a binary heap; push and pop are O(log n).
+
+        Processes come out in order of self.priority(p), lowest first,
+        and in FIFO order among processes with equal priority. The base
+        discipline ranks processes by the order their type is listed in
+        the process generation file, so earlier types always run first.
+
+        args:
+            :process_types (iterable) - process types, highest priority first
+        """
+        self._heap = []
+        self._seq = 0
+        self._ranks = {ptype:rank for rank, ptype in enumerate(process_types)}
+
+    def priority(self, p):
+        return self._ranks[p.type]
+
+    def push(self, p):
+        heapq.heappush(self._heap, (self.priority(p), self._seq, p))
+        self._seq += 1
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2]
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __iter__(self):
+        return (entry[2] for entry in self._heap)
+
+class ShortestDemandReadyQueue(PriorityReadyQueue):
+    """
+    Ready queue that always hands out the process with the least
+    remaining cpu demand (shortest remaining time first)
+    """
+    def priority(self, p):
+        return p.demand
+
+class History(object):
+    def __init__(self, max_len=None):
+        """
+        Append-only history of a cumulative counter (e.g. a CPU's idle time)
+        stored as parallel arrays of (time, value) samples.
+
+        The counter is treated as a step function: its value at any time is
+        the latest sample at or before that time, found by bisection in
+        O(log n). Samples must arrive in nondecreasing time order; a second
+        sample at the same time replaces the first. The latest two samples
+        are also kept on the side, so last_two() is O(1) and exact.
+
+        args:
+            :max_len (int) - if given, once the history grows past max_len
+                             samples every other one is dropped and from then
+                             on only every stride-th sample is kept (the stride
+                             doubling each time); lookups between kept samples
+                             return the earlier one
+        """
+        self.times = array('q')
+        self.values = array('q')
+        self.max_len = max_len
+        self.latest = None      # (time, value) of the latest sample
+        self.previous = None    # (time, value) of the sample before that
+        self._stride = 1
+        self._folded = 0        # samples folded into the last kept one
+
+    def record(self, time, value):
+        if self.times and self.times[-1] == time:
+            self.values[-1] = value
+            self.latest = (time, value)
+            return
+        self.previous, self.latest = self.latest, (time, value)
+        if self._folded + 1 < self._stride and len(self.times) > 1:
+            # between kept samples; slide the last one forward
+            self.times[-1] = time
+            self.values[-1] = value
+            self._folded += 1
+            return
+        self.times.append(time)
+        self.values.append(value)
+        self._folded = 0
+        if self.max_len is not None and len(self.times) > self.max_len:
+            self._downsample()
+
+    def _downsample(self):
+        self.times = self.times[:-1:2] + self.times[-1:]
+        self.values = self.values[:-1:2] + self.values[-1:]
+        self._stride *= 2
+
+    def at(self, time):
+        """
+        value of the counter at `time`; 0 before the first sample
+        """
+        i = bisect_right(self.times, time)
+        if i == 0:
+            return 0
+        return self.values[i - 1]
+
+    def last_two(self):
+        """
+        returns the (time, value) pairs of the two latest samples,
+        older first; None stands in for a sample that doesn't exist
+        """
+        return self.previous, self.latest
+
+    def __len__(self):
+        return len(self.times)
+
 class CPU(object):
     BUSY = 1
     IDLE = 0
 
-    def __init__(self, cpu_id):
+    def __init__(self, cpu_id, history_len=None):
         """
         Instantiate a CPU object, essentially a slot
         for processes to run in the system;
@@ -192,6 +1041,11 @@ class CPU(object):
         Each CPU can be thought of as a core that can
         execute tasks.
 
+        args:
+            :cpu_id (int) - the id of the CPU
+            :history_len (int) - bound on the number of activity/idle samples
+                                 kept, see History; None keeps them all
+
         attributes:
             :id - the id of the CPU
             :active_time (int) - time spent executing jobs
@@ -205,25 +1059,36 @@ class CPU(object):
         self.idle_time = 0
         self.context_switch_time = 0
         self.T = 0
-        self._idle_times = dict()
-        self._active_times = dict()
+        self._idle_times = History(history_len)
+        self._active_times = History(history_len)
         self._slot = None
         self.last_time_active = 0
 
     def activate(self, T, time):
         self.active_time += T
-        self._active_times[time] = self.active_time
+        self._active_times.record(time, self.active_time)
         self.last_time_active = time
 
     def get_activity(self, time):
-        return self._active_times[time]
+        return self._active_times.at(time)
 
     def record_idle(self, T, time):
         self.idle_time += T
-        self._idle_times[time] = self.idle_time
+        self._idle_times.record(time, self.idle_time)
 
     def get_idle(self, time):
-        return self._idle_times[time]
+        return self._idle_times.at(time)
+
+    @property
+    def last_idle_delta(self):
+        """
+        idle time accrued between the last two idle samples;
+        None until there are two samples
+        """
+        previous, latest = self._idle_times.last_two()
+        if previous is None:
+            return None
+        return latest[1] - previous[1]
 
     @property
     def state(self):
@@ -265,20 +1130,20 @@ class CPU(object):
         representation = dict()
         representation['cpu_id'] = self.id
         representation['totals'] = {'active_time':self.active_time, 
-                                    'idle_time': self._idle_times[max(self._idle_times.values())],
+                                    'idle_time': self.idle_time,
                                     'context_switch_time':self.context_switch_time}
         
-        get_t = lambda d:sorted(list(d.keys()))
-        representation['active_time_per_t'] = {'t':get_t(self._active_times),
-                                               'active_time':[self._active_times[t] for t in get_t(self._active_times)]}
+        representation['active_time_per_t'] = {'t':list(self._active_times.times),
+                                               'active_time':list(self._active_times.values)}
 
-        representation['idle_time_per_t'] = {'t':get_t(self._idle_times), 
-                                             'idle_time':[self._idle_times[t] for t in get_t(self._idle_times)]}
+        representation['idle_time_per_t'] = {'t':list(self._idle_times.times), 
+                                             'idle_time':list(self._idle_times.values)}
         
         return representation
 
 class ProcessFactory(object):
-    def __init__(self,procgen='pg.txt',rng=RandomNumberGenerator(),enable_io=True):
+    def __init__(self,procgen='pg.txt',rng=RandomNumberGenerator(),enable_io=True,
+                 common_random_numbers=False):
         """
         Creates a ProcessFactory, an object used
         to spin up new instances of processes.
@@ -294,6 +1159,10 @@ class ProcessFactory(object):
         args:
             :procgen (str) - the input validated process generation file
             :rng (RandomNumberGenerator) 
+            :common_random_numbers (bool) - draw each attribute of each process
+                                    type from its own substream of rng, so the
+                                    k-th process of a type is the same no matter
+                                    in what order processes are asked for
         """
         self.procmap = dict()
         self.enable_io = enable_io
@@ -324,6 +1193,24 @@ class ProcessFactory(object):
                   file=sys.stderr)
             sys.exit()
 
+        self.streams = None
+        if common_random_numbers:
+            attrs = ['demand', 'arrival_time', 'burst_cpu', 'burst_io']
+            if len(self.process_types) * len(attrs) > SUBSTREAMS:
+                # any more would run into the next trial's stream
+                raise ValueError(f'common random numbers support at most {SUBSTREAMS // len(attrs)} '
+                                 f'process types, {procgen} has {len(self.process_types)}')
+            substreams = iter(rng.spawn(len(self.process_types) * len(attrs), stride=SUBSTREAM_STRIDE))
+            self.streams = {ptype:{attr:next(substreams) for attr in attrs} for ptype in self.process_types}
+
+    def _rng(self, process_type, attr):
+        """
+        the generator `attr` of `process_type` processes is drawn from
+        """
+        if self.streams is None:
+            return self.rng
+        return self.streams[process_type][attr]
+
     def _observe(self, process_type, last_time):
         """
         Spins a new process.
@@ -345,17 +1232,45 @@ class ProcessFactory(object):
         
         proc_instance_params = {'type':process_type, # the name of the process
                                 # cpu demand for this proc
-                                'demand':self.rng.exprand(self.procmap[process_type]['demand']), 
+                                'demand':self._rng(process_type, 'demand').exprand(self.procmap[process_type]['demand']), 
                                 # when this proc is submitted
-                                'arrival_time':last_time + self.rng.exprand(self.procmap[process_type]['arrival_time']), 
+                                'arrival_time':last_time + self._rng(process_type, 'arrival_time').exprand(self.procmap[process_type]['arrival_time']), 
                                 # length of time this proc will have burst cpu
-                                'burst_cpu':self.rng.urand(1, 2 * self.procmap[process_type]['burst_cpu']),
-                                # pid
-                                'pid':self.new_pid}
+                                'burst_cpu':self._rng(process_type, 'burst_cpu').urand(1, 2 * self.procmap[process_type]['burst_cpu'])}
 
         if self.enable_io:
             # length of the io burst for this proc
-            proc_instance_params['burst_io'] = self.rng.exprand(self.procmap[process_type]['burst_io'])
+            proc_instance_params['burst_io'] = self._rng(process_type, 'burst_io').exprand(self.procmap[process_type]['burst_io'])
+        return self.new(**proc_instance_params)
+
+    def observe_many(self, process_type, last_time, size):
+        """
+        Draws the next `size` processes of a type at once, from the same
+        distributions as _observe; each arrives one interarrival time after
+        the one before it, the first one after last_time. Needs numpy.
+        args:
+            :process_type (str) - the process type to draw
+            :last_time (int) - the time the interarrivals are counted from
+            :size (int) - number of processes
+        returns:
+            :dict of column name -> list of `size` values, with columns
+             demand, arrival_time, burst_cpu and (with I/O) burst_io
+        """
+        if process_type not in self.procmap:
+            raise ValueError(f'[!] {process_type} not in {list(self.procmap.keys())}')
+        spec = self.procmap[process_type]
+        columns = {'demand':self._rng(process_type, 'demand').exprand_many(spec['demand'], size),
+                   'arrival_time':last_time + np.cumsum(self._rng(process_type, 'arrival_time').exprand_many(spec['arrival_time'], size)),
+                   'burst_cpu':self._rng(process_type, 'burst_cpu').urand_many(1, 2 * spec['burst_cpu'], size)}
+        if self.enable_io:
+            columns['burst_io'] = self._rng(process_type, 'burst_io').exprand_many(spec['burst_io'], size)
+        return {name:column.tolist() for name, column in columns.items()}
+
+    def new(self, **proc_instance_params):
+        """
+        create a process with the given attributes and the next pid
+        """
+        proc_instance_params['pid'] = self.new_pid
         return Process(**proc_instance_params)
 
     @property
@@ -384,6 +1299,373 @@ class ProcessFactory(object):
         return 'Process Factory ({} proc. types)'.format(len(self.procmap))
 
 
+class ArrivalTimeline(object):
+    def __init__(self, factory, chunk=1024):
+        """
+        The future arrivals of every process type, drawn `chunk` at a
+        time per type with ProcessFactory.observe_many.
+
+        Arrivals don't depend on the state of the system, so they don't
+        need to go through the event queue; the simulator merges the
+        earliest one (peek/pop) with the event queue instead. Arrivals at
+        the same time come out in process type order.
+        args:
+            :factory (ProcessFactory) - draws the processes
+            :chunk (int) - processes drawn per type at a time
+        """
+        self.factory = factory
+        self.chunk = chunk
+        self._order = {ptype:i for i, ptype in enumerate(factory.process_types)}
+        self._rows = dict() # ptype -> columns of drawn processes
+        self._pos = dict()  # ptype -> index of its next arrival in _rows
+        self._heap = []     # (next arrival, type order, ptype)
+
+    def add(self, ptype, t):
+        """
+        start the arrivals of a process type, the first one at time t
+        """
+        rows = self.factory.observe_many(ptype, t, self.chunk)
+        # the first draw's interarrival is discarded, like the seed processes'
+        shift = rows['arrival_time'][0] - t
+        rows['arrival_time'] = [a - shift for a in rows['arrival_time']]
+        self._rows[ptype] = rows
+        self._pos[ptype] = 0
+        heapq.heappush(self._heap, (t, self._order[ptype], ptype))
+
+    def peek(self):
+        """
+        time of the next arrival, None if there are none
+        """
+        return self._heap[0][0] if self._heap else None
+
+    def pop(self):
+        """
+        the process that arrives next
+        """
+        _, order, ptype = self._heap[0]
+        rows, i = self._rows[ptype], self._pos[ptype]
+        process = self.factory.new(type=ptype, **{name:column[i] for name, column in rows.items()})
+        i += 1
+        if i == self.chunk:
+            rows = self._rows[ptype] = self.factory.observe_many(ptype, process.arrival_time, self.chunk)
+            i = 0
+        self._pos[ptype] = i
+        heapq.heapreplace(self._heap, (rows['arrival_time'][i], order, ptype))
+        return process
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class RunningStats(object):
+    def __init__(self):
+        """
+        Constant memory summary of a stream of samples.
+
+        Keeps the count, mean, variance (Welford's method), min, max and
+        last value of everything pushed, plus a time-weighted mean in
+        which each sample counts for as long as it was in effect -- per-event
+        sampling over-represents the busy stretches of a run.
+
+        attributes:
+            :n (int) - number of samples
+            :total - sum of the samples
+            :min, :max, :last - smallest, largest and latest sample
+            :area - integral of the sampled value over time
+            :t_first, :t_last - when the first and latest samples took effect
+        """
+        self.n = 0
+        self.total = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.area = 0
+        self.t_first = None
+        self.t_last = None
+
+    def push(self, x, t):
+        """
+        add a sample
+        args:
+            :x - the sampled value
+            :t (int) - the time from which x holds
+        """
+        if self.n == 0:
+            self.min = self.max = x
+            self.t_first = t
+        else:
+            self.min = min(self.min, x)
+            self.max = max(self.max, x)
+            self.area += self.last * (t - self.t_last)
+        self.n += 1
+        self.total += x
+        delta = x - self._mean
+        self._mean += delta / self.n
+        self._m2 += delta * (x - self._mean)
+        self.last = x
+        self.t_last = t
+
+    @property
+    def mean(self):
+        if self.n == 0:
+            return 0
+        return self.total / self.n
+
+    @property
+    def variance(self):
+        """sample variance; 0 for fewer than two samples"""
+        if self.n < 2:
+            return 0
+        return self._m2 / (self.n - 1)
+
+    def time_mean(self, until=None):
+        """
+        time-weighted mean of the samples
+        args:
+            :until (int) - time the latest sample stopped holding; if None
+                           the latest sample is left out of the average
+        """
+        if self.n == 0:
+            return 0
+        area, t_end = self.area, self.t_last
+        if until is not None and until > self.t_last:
+            area += self.last * (until - self.t_last)
+            t_end = until
+        if t_end == self.t_first:
+            return self.last
+        return area / (t_end - self.t_first)
+
+class CompletionLog(object):
+    columns = ['t', 'ptype', 'turnaround', 'wait_time', 'preemptions']
+
+    def __init__(self, process_types):
+        """
+        Column store of per-process post mortem statistics.
+
+        Every completed process appends one row to a set of parallel
+        typed arrays, so a completion costs a few dozen bytes rather
+        than a nest of dicts and lists per distinct timestep.
+
+        columns:
+            :t (int) - time the process terminated
+            :ptype (int) - index of the process type in process_types
+            :turnaround (int) - time from arrival to termination
+            :wait_time (int) - time spent in the ready queue
+            :preemptions (int) - number of times the process was preempted
+        args:
+            :process_types (list) - the process type names
+        """
+        self.process_types = list(process_types)
+        self._ptype_ids = {ptype:i for i, ptype in enumerate(self.process_types)}
+        self.t           = array('q')
+        self.ptype       = array('B')
+        self.turnaround  = array('q')
+        self.wait_time   = array('q')
+        self.preemptions = array('q')
+
+    def append(self, t, ptype, turnaround, wait_time, preemptions):
+        self.t.append(t)
+        self.ptype.append(self._ptype_ids[ptype])
+        self.turnaround.append(turnaround)
+        self.wait_time.append(wait_time)
+        self.preemptions.append(preemptions)
+
+    def __len__(self):
+        return len(self.t)
+
+    def select(self, param, ptype=None, after=None):
+        """
+        return the values of a column, optionally for one process type only
+        args:
+            :param (str) - one of CompletionLog.columns
+            :ptype (str) - process type name; None for all types
+            :after (int) - only processes that terminated after this time
+        """
+        column = getattr(self, param)
+        start = 0 if after is None else bisect_right(self.t, after)
+        if ptype is None:
+            return list(column[start:])
+        pid = self._ptype_ids[ptype]
+        return [v for v, p in zip(column[start:], self.ptype[start:]) if p == pid]
+
+    def per_ptype(self, param):
+        """
+        returns {ptype: [values of param]}
+        """
+        grouped = {ptype:[] for ptype in self.process_types}
+        for v, p in zip(getattr(self, param), self.ptype):
+            grouped[self.process_types[p]].append(v)
+        return grouped
+
+    def throughput(self, ptype):
+        """
+        returns {t: processes of ptype completed by t / t} for every time
+        one completed
+        """
+        pid = self._ptype_ids[ptype]
+        rates, completed = dict(), 0
+        for t, p in zip(self.t, self.ptype):
+            if p == pid:
+                completed += 1
+                rates[t] = completed / t
+        return rates
+
+    def per_t(self, param):
+        """
+        returns {t: {ptype: [values of param]}} for every termination time;
+        param 'completed' gives the number of processes completed instead
+        """
+        grouped = dict()
+        values = self.t if param == 'completed' else getattr(self, param)
+        for t, p, v in zip(self.t, self.ptype, values):
+            if t not in grouped:
+                grouped[t] = {ptype:(0 if param == 'completed' else []) for ptype in self.process_types}
+            if param == 'completed':
+                grouped[t][self.process_types[p]] += 1
+            else:
+                grouped[t][self.process_types[p]].append(v)
+        return grouped
+
+def mser_truncation(means, min_tail=5):
+    """
+    the MSER truncation point of a series: the number d of leading
+    values whose removal minimizes the squared standard error of the
+    mean of what is left,
+        Z(d) = sum_{j >= d} (Y_j - mean(Y_d..))**2 / (k - d)**2
+    with at least min_tail values left. Applied to means of batches
+    of 5 this is MSER-5.
+    args:
+        :means (sequence) - the series, oldest first
+        :min_tail (int) - fewest values to keep
+    returns:
+        :d, or None if the minimum falls in the second half of the series
+         (the series is too short for the warm-up to have ended)
+    """
+    k = len(means)
+    if k < 2 * min_tail:
+        return None
+    best, best_z = None, None
+    s1 = s2 = 0.0
+    for d in range(k - 1, -1, -1):
+        y = means[d]
+        s1 += y
+        s2 += y * y
+        m = k - d
+        if m < min_tail:
+            continue
+        z = (s2 - s1 * s1 / m) / (m * m)
+        if best_z is None or z <= best_z:
+            best, best_z = d, z
+    return best if best <= k // 2 else None
+
+class MSER(object):
+    # fewest batches before a truncation point is looked for
+    MIN_BATCHES = 20
+
+    def __init__(self, batch=5):
+        """
+        Online MSER warm-up detection for one output series.
+
+        Observations are averaged in batches of `batch` (MSER-5 by
+        default); the truncation point is recomputed each time the number
+        of batches has grown by a tenth, so the cost stays linear overall.
+        args:
+            :batch (int) - observations per batch
+        """
+        self.batch = batch
+        self.means = array('d') # batch means
+        self.ends = array('q')  # time the last observation of each batch was made
+        self._sum = 0
+        self._n = 0
+        self._checked = 0
+        self.truncation = None  # batches to drop; None until the warm-up has ended
+
+    def push(self, x, t):
+        """
+        add observation x, made at time t
+        """
+        self._sum += x
+        self._n += 1
+        if self._n == self.batch:
+            self.means.append(self._sum / self.batch)
+            self.ends.append(t)
+            self._sum = self._n = 0
+            if len(self.means) >= max(self.MIN_BATCHES, 1.1 * self._checked):
+                self._checked = len(self.means)
+                self.truncation = mser_truncation(self.means)
+
+    @property
+    def warmup_end(self):
+        """
+        time of the last observation in the warm-up, 0 if there was no
+        warm-up to remove, None if it hasn't ended yet
+        """
+        if self.truncation is None:
+            return None
+        return self.ends[self.truncation - 1] if self.truncation else 0
+
+class BatchMeans(object):
+    def __init__(self, max_batches=64):
+        """
+        Non-overlapping batch means of one output series, sized automatically.
+
+        Observations go into batches of `size` units of weight; once
+        max_batches batches are full, neighbouring batches are merged and
+        the batch size doubles, so there are always between max_batches/2
+        and max_batches of them, in constant memory, however long the run.
+        Weight is 1 per observation for per-process series, or elapsed time
+        for time averages; an observation whose weight spans a batch
+        boundary is split in proportion.
+        args:
+            :max_batches (int) - even number of batches kept at most
+        """
+        self.max_batches = max_batches
+        self.size = 1
+        self.sums = array('d')  # total of each full batch
+        self.ends = array('d')  # time each full batch was completed
+        self._sum = 0.0
+        self._weight = 0
+
+    def push(self, total, weight, t):
+        """
+        add `weight` units worth `total` altogether, ending at time t;
+        weight 0 adds `total` to the current batch (e.g. a count at an instant)
+        """
+        while weight > 0:
+            take = min(weight, self.size - self._weight)
+            part = total * take / weight
+            self._sum += part
+            self._weight += take
+            total -= part
+            weight -= take
+            if self._weight == self.size:
+                self.sums.append(self._sum)
+                self.ends.append(t)
+                self._sum, self._weight = 0.0, 0
+                if len(self.sums) == self.max_batches:
+                    self.sums = array('d', (a + b for a, b in zip(self.sums[::2], self.sums[1::2])))
+                    self.ends = self.ends[1::2]
+                    self.size *= 2
+        self._sum += total
+
+    def interval(self, level=0.95, after=None):
+        """
+        confidence interval for the mean from the full batches
+        args:
+            :level (float) - confidence level
+            :after (float) - leave out batches completed by this time (the warm-up)
+        returns:
+            :(mean, half width, number of batches), or None with fewer than 2 batches
+        """
+        start = 0 if after is None else bisect_right(self.ends, after)
+        means = [total / self.size for total in self.sums[start:]]
+        if len(means) < 2:
+            return None
+        m, hw = confidence_interval(means, level=level)
+        return m, hw, len(means)
+
 class DiscreteEventSimulator(object):
     params = ['ctx_switch',
               'enable_io',
@@ -391,7 +1673,25 @@ class DiscreteEventSimulator(object):
               'num_cpus',
               'stop_time',
               'rng',
-              'procgen']
+              'procgen',
+              'event_queue',
+              'ready_queue',
+              'fast_forward',
+              'record_series',
+              'cpu_history_len',
+              'arrival_chunk',
+              'common_random_numbers',
+              'truncate_warmup',
+              'stop_after',
+              'batch_means',
+              'trace']
+
+    event_queues = {'heap':EventQueue,
+                    'calendar':CalendarEventQueue}
+
+    ready_queues = {'fifo':FIFOReadyQueue,
+                    'priority':PriorityReadyQueue,
+                    'shortest-demand':ShortestDemandReadyQueue}
 
     def __init__(self, **kwargs):
         """
@@ -410,16 +1710,54 @@ class DiscreteEventSimulator(object):
             :enable_io - should I/O faults exist?
             :quantum - lenght of time before preemption happens
             :num_cpus - number of slots to let procs run
+            :event_queue - backend for the event queue, a key of
+                           DiscreteEventSimulator.event_queues (default 'heap')
+            :ready_queue - dispatch discipline for the ready queue, a key of
+                           DiscreteEventSimulator.ready_queues (default 'fifo')
+            :fast_forward - collapse runs of uncontested quanta into a single
+                            TIME_SLICE_EXPIRED (default False; ignored under RL)
+            :record_series - keep every per-event queue length sample in
+                             event_queue_len/ready_queue_len (default False);
+                             otherwise only the running summaries are kept
+            :cpu_history_len - most activity/idle samples each CPU keeps before
+                               downsampling its history (default None, unbounded)
+            :arrival_chunk - if > 0, draw arrivals ahead of time, this many per
+                             process type at a time, and keep them out of the
+                             event queue (default 0, off; needs numpy); the
+                             workload is drawn in a different order, so runs
+                             differ from the default mode
+            :common_random_numbers - draw every attribute of every process type
+                                     from its own substream of rng (default False),
+                                     so runs that only differ in scheduling
+                                     parameters see the same workload
+            :truncate_warmup - detect the end of the warm-up period with MSER-5
+                               on every process type's wait and turnaround times
+                               and leave it out of the summary statistics
+                               (default False)
+            :stop_after - with truncate_warmup, stop the run once this many
+                          processes have completed after the warm-up
+                          (default None, run until stop_time)
+            :batch_means - keep batch means of every process type's wait and
+                           turnaround times, throughput and CPU utilization, and
+                           report confidence intervals from them (default False)
+            :trace - path of a binary event trace (see EventTrace) to write every
+                     handled event to; closed by finalize (default None, no trace)
         """
         self.CONTEXT_SWITCH = kwargs['ctx_switch']
         self.STOPTIME = kwargs['stop_time']
-        self.EVENT_QUEUE = [] # Priority queue
-        self.READY_QUEUE = [] # FIFO queue
+        self.EVENT_QUEUE = self.event_queues[kwargs.get('event_queue', 'heap')]() # Priority queue
+        self.SAME_TICK_QUEUE = deque() # FIFO of zero-delay events, drained before T advances
 
         self._initialized = False
         self.factory = ProcessFactory(procgen=kwargs['procgen'],
                                       rng=kwargs['rng'],
-                                      enable_io=kwargs['enable_io']) 
+                                      enable_io=kwargs['enable_io'],
+                                      common_random_numbers=kwargs.get('common_random_numbers', False)) 
+        self.arrivals = None
+        if kwargs.get('arrival_chunk'):
+            self.arrivals = ArrivalTimeline(self.factory, chunk=kwargs['arrival_chunk'])
+        # FIFO queue unless another dispatch discipline was asked for
+        self.READY_QUEUE = self.ready_queues[kwargs.get('ready_queue', 'fifo')](self.factory.process_types)
 
         self.qtype = kwargs['quantum'][0]
         self.quantum_val = kwargs['quantum'][1]
@@ -431,6 +1769,8 @@ class DiscreteEventSimulator(object):
         if self.qtype == 'r':
             self.RL = True
             self.agent = AdaptivePreemptor(cpu_ct=self.cpu_count, enable_io=self.enable_io)
+        # the RL agent picks a new quantum on every dispatch, so it can't be skipped
+        self.fast_forward = kwargs.get('fast_forward', False) and not self.RL
 
         self.T = 0
         self.T_last = self.T
@@ -438,45 +1778,110 @@ class DiscreteEventSimulator(object):
         self.last_cpu_event_time = self.T
         self.last_cpu_event = None
         # statistics section of attributes
+        self.record_series = kwargs.get('record_series', False)
         self.ready_queue_len = []
         self.event_queue_len = []
+        self.ready_queue_stats = RunningStats()
+        self.event_queue_stats = RunningStats()
         self.events_processed = 0
+        self.zero_delay_events = 0 # events that skipped EVENT_QUEUE entirely
+        self.quanta_fast_forwarded = 0 # dispatch/expire pairs collapsed in fast-forward mode
         self.processes_completed = 0
-        self.process_stats = {ptype:{'completed':0,
-                                     'throughput':dict(), # moving average of number of processes completed per t
-                                     'turnaround_times':[],
-                                     'wait_time':[],'num_preemptions':[]} for ptype in self.factory.process_types}
+        # per-process records live in time_parameterized_process_stats;
+        # finalize fills in the per-type averages
+        self.process_stats = {ptype:{'completed':0} for ptype in self.factory.process_types}
 
         # the postmortem stats for each of the processes available from the factory
-        self.time_parameterized_process_stats = {ptype:{'completed':dict(),
-                                                        'turnaround':dict(),
-                                                        'wait_time':dict(),
-                                                        'preemptions':dict()} for ptype in self.factory.process_types}
-        self.time_parameterized_process_stats = dict()
+        self.time_parameterized_process_stats = CompletionLog(self.factory.process_types)
+
+        # (ptype, stat) -> MSER; see warmup_end
+        self.warmup_detectors = dict()
+        if kwargs.get('truncate_warmup', False):
+            self.warmup_detectors = {(ptype, stat):MSER() for ptype in self.factory.process_types
+                                                          for stat in ('wait_time', 'turnaround')}
+        self.stop_after = kwargs.get('stop_after')
+        self.stopped_early = False
+        self.trace = None
+        if kwargs.get('trace'):
+            self.trace = EventTrace(kwargs['trace'], self.factory.process_types)
+        # series name -> BatchMeans; see summarize
+        self.batch_means = dict()
+        if kwargs.get('batch_means', False):
+            for ptype in self.factory.process_types:
+                self.batch_means[f'wait_time:{ptype}'] = BatchMeans()
+                self.batch_means[f'turnaround:{ptype}'] = BatchMeans()
+            self.batch_means['throughput'] = BatchMeans()
+            self.batch_means['utilization'] = BatchMeans()
 
         # initialize the slots where processes can run 
-        self.CPUs = [CPU(i) for i in range(self.cpu_count)] 
+        self.CPUs = [CPU(i, history_len=kwargs.get('cpu_history_len')) for i in range(self.cpu_count)] 
+        self._cpu_index = {cpu.id:i for i, cpu in enumerate(self.CPUs)}
+        # bit i is set while CPU i is idle; kept current by occupy_cpu/release_cpu
+        self._idle_mask = (1 << self.cpu_count) - 1
         self.last_event = None
 
+        # event type --> handler; see register_handler
+        self.handlers = []
+        self.register_handler(Event.PROCESS_SUBMITTED, self.handle_process_submitted)
+        self.register_handler(Event.PROCESS_DISPATCHED, self.handle_process_dispatched)
+        self.register_handler(Event.PROCESS_TERMINATED, self.handle_process_terminated)
+        self.register_handler(Event.TIME_SLICE_EXPIRED, self.handle_timeslice_expired)
+        self.register_handler(Event.IO_REQUEST, self.handle_io_request)
+        self.register_handler(Event.IO_COMPLETE, self.handle_io_complete)
+
+    def register_handler(self, etype, handler):
+        """
+        make handle_event call `handler` for every event of type `etype`,
+        replacing whatever handled that type before
+        args:
+            :etype (int) - event type code, see Event.register_type
+            :handler (Callable) - called with the Event once the clock has
+                                  been advanced to its timestep
+        """
+        if etype >= len(self.handlers):
+            self.handlers.extend([None] * (etype + 1 - len(self.handlers)))
+        self.handlers[etype] = handler
+
     def record_process_stats(self, terminal_event):
         self.processes_completed += 1
-        ptype = terminal_event.p.type
+        p = terminal_event.p
         t = terminal_event.t
-    
-        if t not in self.time_parameterized_process_stats:
-            self.time_parameterized_process_stats[t] = self.proc_statkeeper(*self.factory.process_types)
-
-        self.time_parameterized_process_stats[t][ptype]['completed'] += 1
-        self.time_parameterized_process_stats[t][ptype]['turnaround'].append(t - terminal_event.p.arrival_time)
-        self.time_parameterized_process_stats[t][ptype]['wait_time'].append(terminal_event.p.wait_time)
-        self.time_parameterized_process_stats[t][ptype]['preemptions'].append(terminal_event.p.num_preemptions)
+        self.time_parameterized_process_stats.append(t, p.type, t - p.arrival_time,
+                                                     p.wait_time, p.num_preemptions)
+        if self.batch_means:
+            self.batch_means[f'wait_time:{p.type}'].push(p.wait_time, 1, t)
+            self.batch_means[f'turnaround:{p.type}'].push(t - p.arrival_time, 1, t)
+            self.batch_means['throughput'].push(1, 0, t)
+        if self.warmup_detectors:
+            self.warmup_detectors[p.type, 'wait_time'].push(p.wait_time, t)
+            self.warmup_detectors[p.type, 'turnaround'].push(t - p.arrival_time, t)
+            if self.stop_after and self.post_warmup_completions() >= self.stop_after:
+                # enough steady state data; end the run here
+                self.STOPTIME = self.T
+                self.stopped_early = True
 
-    def proc_statkeeper(self,*process_types):
+    @property
+    def warmup_end(self):
         """
-        returns a dictionary of dictionaries for process statistics
+        the end of the warm-up period: the latest warm-up end of all the
+        series; None until every series has been seen to leave its warm-up
+        (so rarely completing process types hold it back), or if the
+        warm-up isn't being detected
         """
-        return {pt:dict(map(lambda k:(k,{True:0, False:[]}[k == 'completed']), ['wait_time', 'completed', 'preemptions','turnaround'])) for pt in process_types} 
+        ends = [d.warmup_end for d in self.warmup_detectors.values()]
+        if not ends or None in ends:
+            return None
+        return max(ends)
 
+    def post_warmup_completions(self):
+        """
+        number of processes that completed after the warm-up, 0 until it ends
+        """
+        end = self.warmup_end
+        if end is None:
+            return 0
+        log = self.time_parameterized_process_stats
+        return len(log) - bisect_right(log.t, end)
 
     @property
     def initialized(self):
@@ -485,8 +1890,9 @@ class DiscreteEventSimulator(object):
     def handle_event(self):
         """
         handle an event;
-        there are six (6) different types of events, each with a different
-        way they are handled
+        there are six (6) built-in types of events, each with a different
+        way they are handled; the handler is looked up in self.handlers,
+        indexed by event type (see register_handler)
         
         1. PROCESS_SUBMITTED:  when a process enters the system 
         2. PROCESS_DISPATCHED: when a process moves running state onto an unoccupied CPU 
@@ -502,44 +1908,25 @@ class DiscreteEventSimulator(object):
         # update the current time
         event = self.dequeue_event()
         self.record_status()
+        if self.batch_means and event.t > self.T:
+            # time-weighted series, over the stretch the clock is about to skip
+            dt = event.t - self.T
+            busy = self.cpu_count - self._idle_mask.bit_count()
+            self.batch_means['utilization'].push(busy * dt / self.cpu_count, dt, event.t)
+            self.batch_means['throughput'].push(0, dt, event.t)
         self.T_last = self.T
         self.T = event.t
-        # update the wait times of processes in the ready queue if there are any
-        for proc in self.READY_QUEUE:
-            proc.wait_time += self.T - self.T_last
-
+        # wait times of processes in the ready queue are settled when they
+        # are dequeued; see enqueue_process/dequeue_process
         if self.RL:
             self.agent.setTime(self.T)
+        if self.trace is not None:
+            self.trace.write(event)
 
-        if event.type == Event.PROCESS_SUBMITTED:
-            self.handle_process_submitted(event)
-
-        elif event.type == Event.PROCESS_DISPATCHED:
-            self.handle_process_dispatched(event)
-
-        elif event.type == Event.PROCESS_TERMINATED:
-            self.handle_process_terminated(event)
-            if self.last_cpu_event is not None and self.RL:
-                self.update_policy(event)
-            self.last_cpu_event_time = self.T
-            self.last_cpu_event = event
-
-        elif event.type == Event.TIME_SLICE_EXPIRED:
-            self.handle_timeslice_expired(event)
-            if self.last_event is not None and self.RL:
-                self.update_policy(event)
-            #self.last_cpu_event_time = self.T
-            #self.last_cpu_event = event
-
-        elif event.type == Event.IO_REQUEST:
-            self.handle_io_request(event)
-            if self.last_event is not None and self.RL:
-                self.update_policy(event)
-            #self.last_cpu_event_time = self.T
-            #self.last_cpu_event = event
-
-        elif event.type == Event.IO_COMPLETE:
-            self.handle_io_complete(event)
+        handler = self.handlers[event.type] if event.type < len(self.handlers) else None
+        if handler is None:
+            raise ValueError(f'No handler registered for {Event.NAMES[event.type]} events')
+        handler(event)
 
         #for cpu in self.CPUs:
         #    if cpu.is_idle:
@@ -577,7 +1964,7 @@ class DiscreteEventSimulator(object):
                 dispatched = Event(etype=Event.PROCESS_DISPATCHED, t=self.T, proc=self.dequeue_process())
                 self.enqueue_process(process)
 
-            dispatched.p.cpu = self.CPUs[self.locate_cpu(self.idle_cpu)]
+            dispatched.p.cpu = self.CPUs[self.idle_cpu]
             if self.RL:
                 self.assign_quantum(dispatched)
             self.enqueue_event(dispatched)
@@ -587,10 +1974,12 @@ class DiscreteEventSimulator(object):
             self.enqueue_process(process)
 
         # generate a new PROCESS_SUBMITTED event in the event queue
-        next_proc = self.factory(process.type, self.T) 
-        e = Event(etype=Event.PROCESS_SUBMITTED, t=next_proc.arrival_time,proc=next_proc)
-        self.assign_quantum(e)
-        self.enqueue_event(e)
+        # (unless arrivals were drawn ahead of time)
+        if self.arrivals is None:
+            next_proc = self.factory(process.type, self.T) 
+            e = Event(etype=Event.PROCESS_SUBMITTED, t=next_proc.arrival_time,proc=next_proc)
+            self.assign_quantum(e)
+            self.enqueue_event(e)
 
     def handle_process_dispatched(self, event):
         """
@@ -608,20 +1997,26 @@ class DiscreteEventSimulator(object):
         
         Context switching penalty is incurred here
 
+        In fast-forward mode case (a) may cover several back to back quanta,
+        see uncontested_quanta
+
         args:
             :Event with type PROCESS_DISPATCHED
         """
         process = event.p
         if event.p.cpu.is_idle:
             event.p.cpu.record_idle(self.T - event.p.cpu.last_time_active, self.T)
-            self.CPUs[self.locate_cpu(event.p.cpu.id)](event.p, ctx=self.CONTEXT_SWITCH) # assign proc to a CPU
+            self.occupy_cpu(event.p.cpu, event.p) # assign proc to a CPU
             # want to either keep the current time cpu burst time or 
             # not overshoot the demand
             process.cpu_current = min(process.cpu_current, process.demand)
             # builtin short circuiting should trip if QUANTUM == None before evaluating second half
             if process.QUANTUM is not None and process.cpu_current > process.QUANTUM:
                 # TIME_SLICE_EXPIRED @ self.T + self.QUANTUM
-                e = Event(etype=Event.TIME_SLICE_EXPIRED, t=self.T + process.QUANTUM + self.CONTEXT_SWITCH, proc=process)
+                if self.fast_forward:
+                    process.run_quanta = self.uncontested_quanta(process)
+                t = self.T + process.run_quanta * (process.QUANTUM + self.CONTEXT_SWITCH)
+                e = Event(etype=Event.TIME_SLICE_EXPIRED, t=t, proc=process)
                 self.enqueue_event(e)
             elif process.QUANTUM is None or process.cpu_current <= process.QUANTUM:
                 # in this case we can either enqueue an I/O request or terminate
@@ -648,29 +2043,30 @@ class DiscreteEventSimulator(object):
             --> when the time that a process has been running exceeds the quantum
             - remove from CPUs
             - dequeue the next process and dispatch it
+            - let the RL agent (if any) learn from the transition
         """
         process = event.p
-        self.CPUs[self.locate_cpu(process.cpu.id)].activate(process.demand,self.T)
+        process.cpu.activate(process.demand,self.T)
         process.demand = 0        
         process.cpu_current = 0
         cpu = process.cpu
-        ~self.CPUs[self.locate_cpu(process.cpu.id)]
+        self.release_cpu(process.cpu)
         process.cpu = None
         # record the process post mortem stats for this process type
         self.record_process_stats(event)
-        # record the process post mortem stats for this process type
         self.process_stats[process.type]['completed'] += 1
-        self.process_stats[process.type]['throughput'][self.T] = self.process_stats[process.type]['completed']/self.T
-        self.process_stats[process.type]['turnaround_times'].append(self.T - process.arrival_time)
-        self.process_stats[process.type]['wait_time'].append(process.wait_time)
-        self.process_stats[process.type]['num_preemptions'].append(process.num_preemptions)
         self.processes_completed += 1
         if self.READY_QUEUE:
             e = Event(etype=Event.PROCESS_DISPATCHED,t=self.T, proc=self.dequeue_process())
-            e.p.cpu = self.CPUs[self.locate_cpu(self.idle_cpu)]
+            e.p.cpu = self.CPUs[self.idle_cpu]
             if self.RL:
                 self.assign_quantum(e)
             self.enqueue_event(e)
+
+        if self.last_cpu_event is not None and self.RL:
+            self.update_policy(event)
+        self.last_cpu_event_time = self.T
+        self.last_cpu_event = event
    
     def handle_timeslice_expired(self, event):
         """
@@ -682,15 +2078,21 @@ class DiscreteEventSimulator(object):
            - decrease the current cpu cycle and demand by the quantum
            - enqueue the process in the ready queue
            - dequeue the next process from the ready queue, assign it to the CPU (follow process dispatched protocol)
+           - let the RL agent (if any) learn from the transition
         """
         process = event.p
+        # a fast-forwarded slice stands in for run_quanta expire/dispatch pairs
+        quanta = process.run_quanta
+        process.run_quanta = 1
         # pop process off of CPUs, to be replaced with new proc
-        self.CPUs[self.locate_cpu(process.cpu.id)].activate(process.QUANTUM, self.T)
-        ~self.CPUs[self.locate_cpu(process.cpu.id)]
+        process.cpu.activate(quanta * process.QUANTUM, self.T)
+        process.cpu.context_switch_time += (quanta - 1) * self.CONTEXT_SWITCH
+        self.release_cpu(process.cpu)
         process.cpu = None
-        process.num_preemptions += 1
-        process.demand -= process.QUANTUM 
-        process.cpu_current -= process.QUANTUM
+        process.num_preemptions += quanta
+        process.demand -= quanta * process.QUANTUM 
+        process.cpu_current -= quanta * process.QUANTUM
+        self.quanta_fast_forwarded += quanta - 1
 
         if self.READY_QUEUE:
             e = Event(etype=Event.PROCESS_DISPATCHED,t=self.T, proc=self.dequeue_process())
@@ -698,11 +2100,55 @@ class DiscreteEventSimulator(object):
         else:
             e = Event(etype=Event.PROCESS_DISPATCHED,t=self.T,proc=process) 
 
-        e.p.cpu = self.CPUs[self.locate_cpu(self.idle_cpu)]
+        e.p.cpu = self.CPUs[self.idle_cpu]
         if self.RL:
             self.assign_quantum(e)
         self.enqueue_event(e)
 
+        if self.last_event is not None and self.RL:
+            self.update_policy(event)
+
+    def uncontested_quanta(self, process):
+        """
+        number of back to back quanta `process`, just dispatched, can run
+        before anything could contend for its CPU.
+
+        With an empty ready queue, each quantum boundary is a point where the
+        process would be preempted and immediately re-dispatched because
+        nothing else is ready. Nothing can become ready before the earliest
+        pending event,
+        so every boundary strictly before it can be skipped; the last slice
+        still expires normally, and whatever happens during it happens
+        exactly as it would have step by step.
+
+        The collapsed slice itself has to expire before STOPTIME: the run
+        stops once an event at or after STOPTIME is handled, and a slice
+        still pending then would take the quanta it covers with it.
+        """
+        if self.READY_QUEUE:
+            # something is already waiting; it takes over at the first boundary
+            return 1
+        idle = self.idle_cpu
+        if idle is not None and idle < process.cpu.id:
+            # re-dispatch picks the lowest idle cpu, so the process would migrate
+            return 1
+        step = process.QUANTUM + self.CONTEXT_SWITCH
+        # TIME_SLICE_EXPIRED events left before the cpu burst runs out
+        quanta = (process.cpu_current - 1) // process.QUANTUM
+        # the expiry at T + quanta*step must land before STOPTIME
+        quanta = min(quanta, -(-(self.STOPTIME - self.T) // step) - 1)
+        horizon = None
+        if self.SAME_TICK_QUEUE:
+            horizon = self.T
+        elif self.EVENT_QUEUE:
+            horizon = self.EVENT_QUEUE.peek().t
+        if self.arrivals:
+            horizon = self.arrivals.peek() if horizon is None else min(horizon, self.arrivals.peek())
+        # boundaries T + j*step for j < quanta must land before the horizon
+        if horizon is not None:
+            quanta = min(quanta, -(-(horizon - self.T) // step))
+        return max(quanta, 1)
+
     def handle_io_request(self, event):
         """
         handle IO_REQUEST
@@ -711,12 +2157,13 @@ class DiscreteEventSimulator(object):
            --> when a process in running states gets I/O request
            - update the time remaining for this process, subtracting the cpu burst time
            - put new IO_COMPLETE event in the event queue at current_time + io service time
+           - let the RL agent (if any) learn from the transition
         """
         process = event.p
         process.demand -= process.cpu_current
-        self.CPUs[self.locate_cpu(process.cpu.id)].activate(process.cpu_current, self.T)
-        #self.CPUs[self.locate_cpu(process.cpu.id)].active_time += process.cpu_current
-        ~self.CPUs[self.locate_cpu(process.cpu.id)] # open up a resource
+        process.cpu.activate(process.cpu_current, self.T)
+        #process.cpu.active_time += process.cpu_current
+        self.release_cpu(process.cpu) # open up a resource
         process.cpu = None
         # reset time remaining to next io burst
         io_complete = Event(etype=Event.IO_COMPLETE, t=self.T + process.burst_io, proc=process)
@@ -725,11 +2172,14 @@ class DiscreteEventSimulator(object):
         # if there is a process to take up the an open resource then schedule a dispatch
         if self.READY_QUEUE:
             dispatch = Event(etype=Event.PROCESS_DISPATCHED,t=self.T, proc=self.dequeue_process())
-            dispatch.p.cpu = self.CPUs[self.locate_cpu(self.idle_cpu)]
+            dispatch.p.cpu = self.CPUs[self.idle_cpu]
             if self.RL:
                 self.assign_quantum(dispatch)
             self.enqueue_event(dispatch)
 
+        if self.last_event is not None and self.RL:
+            self.update_policy(event)
+
     def handle_io_complete(self, event):
         """
         handle IO_COMPLETE  
@@ -749,7 +2199,7 @@ class DiscreteEventSimulator(object):
                 e = Event(Event.PROCESS_DISPATCHED, t=self.T,proc=self.dequeue_process())
                 self.enqueue_process(process)
             # enequeue the event 
-            e.p.cpu = self.CPUs[self.locate_cpu(self.idle_cpu)]
+            e.p.cpu = self.CPUs[self.idle_cpu]
             if self.RL:
                 self.assign_quantum(e)
             self.enqueue_event(e)
@@ -772,7 +2222,11 @@ class DiscreteEventSimulator(object):
             :EVENT_QUEUE - initialized event queue
         """
         # submit seed processes to the event queue
-        if not self.initialized:
+        if not self.initialized and self.arrivals is not None:
+            for i, ptype in enumerate(self.factory):
+                self.arrivals.add(ptype, i)
+            self._initialized = True
+        elif not self.initialized:
             for i, ptype in enumerate(self.factory):
                 proc_instance = self.factory(ptype, 0)
                 proc_instance.arrival_time = i  # set the submission time for seed procs
@@ -791,61 +2245,124 @@ class DiscreteEventSimulator(object):
         get an idle CPU; return None if none exist
         """
         #self.CPUs = sorted(self.CPUs, key=lambda cpu:cpu.idle_time(self.T), reverse=True)
-        if any(cpu.is_idle for cpu in self.CPUs):
-            return [cpu.id for cpu in self.CPUs if cpu.is_idle][0]
+        if self._idle_mask:
+            # lowest set bit == lowest numbered idle cpu
+            return (self._idle_mask & -self._idle_mask).bit_length() - 1
         return None
 
     def locate_cpu(self, idx):
-        for i, cpu in enumerate(self.CPUs):
-            if cpu.id == idx:
-                return i
+        return self._cpu_index.get(idx)
+
+    def occupy_cpu(self, cpu, proc):
+        """
+        run proc on cpu, paying the context switch penalty
+        """
+        cpu(proc, ctx=self.CONTEXT_SWITCH)
+        self._idle_mask &= ~(1 << cpu.id)
+
+    def release_cpu(self, cpu):
+        """
+        take whatever is running off of cpu
+        """
+        ~cpu
+        self._idle_mask |= 1 << cpu.id
     
     def enqueue_event(self, e):
         """
-        push an event onto the priority queue
+        push an event onto the priority queue;
+        zero-delay events (e.t == T) go to SAME_TICK_QUEUE instead,
+        saving a push and a pop on EVENT_QUEUE
         args:
             :e (Event) - event with priority e.t 
         """
-        self.EVENT_QUEUE.append(e)
-        self.EVENT_QUEUE = sorted(self.EVENT_QUEUE, key=lambda e:e.t)
+        if e.t == self.T:
+            self.SAME_TICK_QUEUE.append(e)
+            self.zero_delay_events += 1
+        else:
+            self.EVENT_QUEUE.push(e)
 
     def dequeue_event(self):
         """
-        pop the top of the EventQueue, maintaining
-        the heap invariant
+        pop the earliest event, maintaining the heap invariant;
+        events that share a timestep come out in the order they were
+        enqueued -- anything in EVENT_QUEUE at t == T was enqueued before
+        T was reached, so it goes ahead of the zero-delay events;
+        arrivals drawn ahead of time go after EVENT_QUEUE events at the
+        same timestep and before zero-delay ones
         """
-        return self.EVENT_QUEUE.pop(0)
+        if self.arrivals:
+            t = self.arrivals.peek()
+            top = self.EVENT_QUEUE.peek()
+            if (top is None or t < top.t) and (t == self.T or not self.SAME_TICK_QUEUE):
+                e = Event(etype=Event.PROCESS_SUBMITTED, t=t, proc=self.arrivals.pop())
+                self.assign_quantum(e)
+                return e
+        if self.SAME_TICK_QUEUE:
+            top = self.EVENT_QUEUE.peek()
+            if top is None or top.t > self.T:
+                return self.SAME_TICK_QUEUE.popleft()
+        return self.EVENT_QUEUE.pop()
 
     def enqueue_process(self, p):
-        self.READY_QUEUE.append(p)
+        """
+        mark a process ready; it starts accruing wait time now
+        """
+        p.ready_since = self.T
+        self.READY_QUEUE.push(p)
     
     def dequeue_process(self):
-        return self.READY_QUEUE.pop(0)
+        """
+        take the next ready process, charging it for the time it waited
+        """
+        p = self.READY_QUEUE.pop()
+        p.wait_time += self.T - p.ready_since
+        p.ready_since = None
+        return p
 
     def record_status(self):
         """
         record statistics for the system
         """
-        self.event_queue_len.append(len(self))
-        self.ready_queue_len.append(len(self.READY_QUEUE))
+        self.event_queue_stats.push(len(self), self.T)
+        self.ready_queue_stats.push(len(self.READY_QUEUE), self.T)
+        if self.record_series:
+            self.event_queue_len.append(len(self))
+            self.ready_queue_len.append(len(self.READY_QUEUE))
         self.events_processed += 1
 
 
     def finalize(self):
         """
         compute system/process based post mortem run statistics
+        (and close the event trace, if any)
         """
+        if self.trace is not None:
+            self.trace.close()
         self.SIMULATION_LEN = self.T
-        self.avg_eq_len = sum(self.event_queue_len)/len(self.event_queue_len)
-        self.avg_rq_len = sum(self.ready_queue_len)/len(self.ready_queue_len)
-        self.final_eq_len = self.event_queue_len[-1]
-        self.final_rq_len = self.ready_queue_len[-1]
+        self.avg_eq_len = self.event_queue_stats.mean
+        self.avg_rq_len = self.ready_queue_stats.mean
+        self.time_avg_eq_len = self.event_queue_stats.time_mean(until=self.T)
+        self.time_avg_rq_len = self.ready_queue_stats.time_mean(until=self.T)
+        self.final_eq_len = self.event_queue_stats.last
+        self.final_rq_len = self.ready_queue_stats.last
+        # statistics leave out the warm-up when it has been detected
+        self.warmup_T = self.warmup_end
+        log = self.time_parameterized_process_stats
         for ptype in self.factory.process_types:
-            if self.process_stats[ptype]['turnaround_times']:
-                turnarounds = self.process_stats[ptype]['turnaround_times']
-                self.process_stats[ptype]['final_turnaround'] = turnarounds[-1]
-                self.process_stats[ptype]['longest_turnaround'] = max(turnarounds)
-                self.process_stats[ptype]['average_turnaround'] = sum(turnarounds)/len(turnarounds) 
+            turnarounds = log.select('turnaround', ptype, after=self.warmup_T)
+            wait_times = log.select('wait_time', ptype, after=self.warmup_T)
+            stats = self.process_stats[ptype]
+            # completions the statistics below cover; a type with none after
+            # the warm-up has no statistics at all, not whole-run ones
+            stats['counted'] = len(turnarounds)
+            if turnarounds:
+                stats['final_turnaround'] = turnarounds[-1]
+                stats['longest_turnaround'] = max(turnarounds)
+                stats['average_turnaround'] = sum(turnarounds)/len(turnarounds) 
+                stats['average_wait_time'] = sum(wait_times)/len(wait_times)
+            else:
+                for key in ('final_turnaround', 'longest_turnaround', 'average_turnaround', 'average_wait_time'):
+                    stats.pop(key, None)
 
     def summarize(self):
         self.finalize()
@@ -855,13 +2372,40 @@ class DiscreteEventSimulator(object):
         summary+= '=====- SIMULATION SUMMARY -=====' + nl
         summary+= f'Simulation Length: {self.SIMULATION_LEN}' + nl
         summary+= f'Total processes completed: {self.processes_completed}' + nl
-        summary+= f'Total events processed: {self.events_processed}' + delim
+        summary+= f'Total events processed: {self.events_processed}'
+        if self.warmup_detectors:
+            if self.warmup_T is None:
+                summary+= nl + 'Warm-up (MSER-5): not over yet; statistics cover the whole run'
+            else:
+                summary+= nl + f'Warm-up (MSER-5): ended at t={self.warmup_T}; ' + \
+                          f'statistics cover the {self.post_warmup_completions()} processes completed after it' + \
+                          (' (stopped early)' if self.stopped_early else '')
+        summary+= delim
         summary+= 'Ready Queue Statistics' + nl
         summary+= f' > average length: {round(self.avg_rq_len)}' + nl
+        summary+= f' > time-weighted : {round(self.time_avg_rq_len)}' + nl
+        summary+= f' > max length    : {self.ready_queue_stats.max}' + nl
         summary+= f' > final length  : {round(self.final_rq_len)}' + delim
         summary+= 'Event Queue Statistics' + nl
         summary+= f' > average length: {round(self.avg_eq_len)}' + nl
-        summary+= f' > final length  : {round(self.final_eq_len)}' + delim
+        summary+= f' > time-weighted : {round(self.time_avg_eq_len)}' + nl
+        summary+= f' > max length    : {self.event_queue_stats.max}' + nl
+        summary+= f' > final length  : {round(self.final_eq_len)}' + nl
+        summary+= f' > zero-delay    : {self.zero_delay_events} ({2 * self.zero_delay_events} queue operations saved)'
+        if self.fast_forward:
+            summary+= nl + f' > fast-forward  : {self.quanta_fast_forwarded} quanta collapsed'
+        summary+= delim
+        if self.batch_means:
+            bm_strs = ['Batch Means (95% confidence intervals' +
+                       (', after the warm-up)' if self.warmup_T is not None else ')')]
+            for name, bm in self.batch_means.items():
+                ci = bm.interval(after=self.warmup_T)
+                if ci is None:
+                    bm_strs.append(f' > {name:<24s}: too few batches')
+                else:
+                    m, hw, k = ci
+                    bm_strs.append(f' > {name:<24s}: {m:.4f} +/- {hw:.4f} ({k} batches of {bm.size})')
+            summary+= nl.join(bm_strs) + delim
         summary+= 'Process Statistics' + nl
         summary+= '{0:<11s} - {1:<10s} - {2:<15s} - {3:<15s} - {4:<15s} - {5:<15s}'.format('Type',
                                                                                            '# Completed',
@@ -871,20 +2415,19 @@ class DiscreteEventSimulator(object):
                                                                                            'Avg. wait time') + delim
         proc_strs = []
         for ptype in self.factory.process_types:
-            fmt = f"{ptype:<11s} | {self.process_stats[ptype]['completed']:>11d} | " 
-            mx_turnaround    = self.process_stats[ptype]['longest_turnaround']
-            avg_turnaround   = self.process_stats[ptype]['average_turnaround']
-            final_turnaround = self.process_stats[ptype]['final_turnaround'] 
-            mean_wait_time   = sum(self.process_stats[ptype]['wait_time'])/len(self.process_stats[ptype]['wait_time'])
-
-
+            stats = self.process_stats[ptype]
+            fmt = f"{ptype:<11s} | {stats['counted']:>11d} | " 
             try:
+                mx_turnaround    = stats['longest_turnaround']
+                avg_turnaround   = stats['average_turnaround']
+                final_turnaround = stats['final_turnaround'] 
+                mean_wait_time   = stats['average_wait_time']
                 fmt = fmt + "{:>15s} | ".format(f"{round(avg_turnaround)} ({quick_ratio(avg_turnaround, self.T)}%)")
                 fmt = fmt + "{:>15s} | ".format(f"{mx_turnaround} ({quick_ratio(mx_turnaround, self.T)}%)")
                 fmt = fmt + "{:>15s} | ".format(f"{final_turnaround} ({quick_ratio(final_turnaround, self.T)}%)")
                 fmt = fmt + "{:>15s}".format(f"{round(mean_wait_time)} ({quick_ratio(mean_wait_time, self.T)}%)")
             except KeyError:
-                fmt = fmt + "no turnaround data" 
+                fmt = fmt + "{:>15s} | {:>15s} | {:>15s} | {:>15s}".format(*4 * ['n/a'])
             proc_strs.append(fmt)
         summary += "\n".join(proc_strs) + delim
         summary += 'CPU statistics' + nl
@@ -911,21 +2454,17 @@ class DiscreteEventSimulator(object):
         #return 
         #ncomp = sum(self.time_parameterized_process_stats[self.T_last][ptype]['completed'] for ptype in self.factory.process_types)
         #wait_time_p = self.time_parameterized_process_stats[self.T_last]
-        activity = 0
         idle = 0
-        n_active = 0
-        n_idle = 0
         for cpu in self.CPUs:
-            try:
-                mx1 = max(cpu._idle_times.keys())
-                mx2 = max(set(cpu._idle_times.keys()) - set([mx1]))
-                idle += cpu.get_idle(mx1) - cpu.get_idle(mx2)
-            except ValueError:
-                #idle += cpu.get_idle(mx1)
+            delta = cpu.last_idle_delta
+            if delta is None:
+                # fewer than two idle samples on this cpu
                 idle = 0
+                continue
+            idle += delta
                 
         if -idle > 0:
-            sys.exit(f"\n{cpu.get_idle(mx1)}, {cpu.get_idle(mx2)}")
+            sys.exit(f"\nnegative idle time {idle} between the last two samples")
         return -idle
 
     def get_state_features(self, event):
@@ -946,11 +2485,7 @@ class DiscreteEventSimulator(object):
             elif "idletime" in feat:
                 cpu_id = int(feat.split("_")[1])
                 cpu = self.CPUs[self.locate_cpu(cpu_id)]
-                try:
-                    idle_time_T, idle_time_T_last = cpu.get_idle(self.T), cpu.get_idle(self.T_last) 
-                except KeyError:
-                    idle_time_T = idle_time_T_last = 0
-                state_features[feat] = idle_time_T - idle_time_T_last
+                state_features[feat] = cpu.get_idle(self.T) - cpu.get_idle(self.T_last)
             elif feat == "time_in_system":
                 state_features[feat] = self.T - event.p.arrival_time 
 
@@ -999,5 +2534,9 @@ class DiscreteEventSimulator(object):
         return self.T >= i
     
     def __len__(self):
-        return len(self.EVENT_QUEUE)
+        pending = len(self.EVENT_QUEUE) + len(self.SAME_TICK_QUEUE)
+        if self.arrivals is not None:
+            # one pending arrival per process type, as in the event queue otherwise
+            pending += len(self.arrivals)
+        return pending
 
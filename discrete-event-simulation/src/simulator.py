@@ -1,7 +1,13 @@
 import sys, os
+import gc
+import time
+import json
 import random
+import sqlite3
 import argparse
-from desutils import RandomNumberGenerator, DiscreteEventSimulator
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from desutils import RandomNumberGenerator, DiscreteEventSimulator, Checkpointer, load_checkpoint, derive_seed, SPAWN_STRIDE, SPAWN_STREAMS, confidence_interval
 import pickle
 import matplotlib.pyplot as plt
 
@@ -90,6 +96,52 @@ def parse_args():
                         default=0,
                         type=natural_num_inc0)
 
+    parser.add_argument('--event-queue',
+                        dest='event_queue',
+                        choices=sorted(DiscreteEventSimulator.event_queues),
+                        default='heap',
+                        help='Event queue backend; "heap" is a binary heap, '+
+                             '"calendar" buckets events on their integer timestep')
+
+    parser.add_argument('--ready-queue',
+                        dest='ready_queue',
+                        choices=sorted(DiscreteEventSimulator.ready_queues),
+                        default='fifo',
+                        help='Dispatch discipline for the ready queue; "fifo" is first come first served, '+
+                             '"priority" favors process types listed earlier in the procgen file, '+
+                             '"shortest-demand" runs the process with the least demand left')
+
+    parser.add_argument('--pause-gc',
+                        dest='pause_gc',
+                        action='store_true',
+                        default=False,
+                        help='Disable cyclic garbage collection while the simulation runs')
+
+    parser.add_argument('--fast-forward',
+                        dest='fast_forward',
+                        action='store_true',
+                        default=False,
+                        help='Collapse runs of uncontested quanta into a single time slice')
+
+    parser.add_argument('--record-series',
+                        dest='record_series',
+                        action='store_true',
+                        default=False,
+                        help='Keep the full per-event queue length series (memory grows with run length)')
+
+    parser.add_argument('--cpu-history',
+                        dest='cpu_history_len',
+                        type=natural_num_gt0,
+                        default=None,
+                        help='Most activity/idle samples kept per CPU before the history is downsampled')
+
+    parser.add_argument('--arrival-chunk',
+                        dest='arrival_chunk',
+                        default=0,
+                        type=natural_num_inc0,
+                        help='draw arrivals ahead of time, this many per process type at a time, '+
+                             'and keep them out of the event queue (needs numpy; 0 for off)')
+
     parser.add_argument('--no-io-faults','-n',
                         dest='disable_io',
                         action='store_true',
@@ -119,12 +171,109 @@ def parse_args():
                         type=natural_num_gt0,
                         help='number of trials to do')
 
+    parser.add_argument('--common-random-numbers','-crn',
+                        dest='common_random_numbers',
+                        action='store_true',
+                        default=False,
+                        help='draw each attribute of each process type from its own substream, '+
+                             'so runs with the same seed see the same workload whatever the scheduling '+
+                             '(rand48 only, so not with -m)')
+
+    parser.add_argument('--antithetic',
+                        dest='antithetic',
+                        action='store_true',
+                        default=False,
+                        help='run trials in antithetic pairs: odd trials draw 1 - u where '+
+                             'the trial before them drew u (rand48 only, so not with -m)')
+
+    parser.add_argument('--truncate-warmup',
+                        dest='truncate_warmup',
+                        action='store_true',
+                        default=False,
+                        help='detect the end of the warm-up period with MSER-5 and leave '+
+                             'it out of the summary statistics')
+
+    parser.add_argument('--stop-after',
+                        dest='stop_after',
+                        default=None,
+                        type=natural_num_gt0,
+                        help='with --truncate-warmup, end a trial once this many processes '+
+                             'have completed after the warm-up')
+
+    parser.add_argument('--batch-means',
+                        dest='batch_means',
+                        action='store_true',
+                        default=False,
+                        help='report batch means confidence intervals for wait time, turnaround, '+
+                             'throughput and CPU utilization from each single run')
+
+    parser.add_argument('--trace',
+                        dest='trace',
+                        action='store_true',
+                        default=False,
+                        help='write every handled event to a binary trace per trial '+
+                             '(<output>/traces/DES_Trace_trialNNN.bin; read it with desutils.read_trace); '+
+                             'costs about 0.5us per event, typically 5-15%% more run time, up to ~25%%')
+
+    parser.add_argument('--ci-target',
+                        dest='ci_target',
+                        default=None,
+                        type=float,
+                        help='run trials (in batches of --workers) until the confidence interval of every '+
+                             '--ci-metrics metric is within this fraction of its mean, or --num-trials '+
+                             'trials have run')
+
+    parser.add_argument('--ci-metrics',
+                        dest='ci_metrics',
+                        nargs='+',
+                        default=['wait_time'],
+                        choices=['wait_time','turnaround','processes_completed'],
+                        help='metrics --ci-target applies to; wait_time and turnaround are '+
+                             'the per-trial means of each process type')
+
+    parser.add_argument('--ci-level',
+                        dest='ci_level',
+                        default=0.95,
+                        type=float,
+                        help='confidence level of the --ci-target intervals')
+
+    parser.add_argument('--workers',
+                        dest='workers',
+                        default=1,
+                        type=natural_num_gt0,
+                        help='number of trials to run in parallel')
+
     parser.add_argument('--seed','-s',
                         dest='seed',
                         type=int,
                         default=None,
                         help='Seed for random number generation') 
 
+    parser.add_argument('--checkpoint-every',
+                        dest='checkpoint_every',
+                        type=natural_num_gt0,
+                        default=None,
+                        help='Checkpoint the running trial to <output>/checkpoints every this many events')
+
+    parser.add_argument('--checkpoint-interval',
+                        dest='checkpoint_interval',
+                        type=float,
+                        default=None,
+                        help='Checkpoint the running trial to <output>/checkpoints every this many seconds')
+
+    parser.add_argument('--resume',
+                        dest='resume',
+                        type=exists,
+                        default=None,
+                        help='Resume from a checkpoint file; the arguments of the checkpointed run are reused')
+
+    parser.add_argument('--rng-buffer',
+                        dest='rng_buffer',
+                        default=0,
+                        type=natural_num_inc0,
+                        help='generate rand48 values this many at a time (vectorized with numpy '+
+                             'when available); the sequence is the same as unbuffered')
+
     parser.add_argument('--mersenne-twister','-m',
                         dest='mers',
                         action='store_true',
@@ -150,12 +299,182 @@ def summarize_arguments(args,filename='args.txt'):
     with open(arg_summary, 'w') as summary:
         print(summ_str, file=summary)
 
-def main(args,t=0):
+def max_trials(antithetic=False):
+    """
+    how many trials trial_rng can give streams of their own
+    """
+    return SPAWN_STREAMS * (2 if antithetic else 1)
+
+def trial_rng(seed, t, mers=False, buffer=0, antithetic=False):
+    """
+    trial t draws from a rand48 stream derived from the seed, jumped
+    ahead t strides, so trials never overlap and results don't depend on
+    which worker runs which trial; the random module (used by the RL
+    agent) gets a seed derived from the seed and t. Every seed, 0
+    included, gives the same streams every time.
+    args:
+        :seed (int) - base seed of the run
+        :t (int) - trial number
+        :mers (bool) - draw from the mersenne twister instead of rand48
+        :buffer (int) - block size for buffered rand48, 0 for unbuffered
+        :antithetic (bool) - pair trials up; trial 2k+1 reuses the stream
+                             of trial 2k, antithetically
+    """
+    stream = t // 2 if antithetic else t
+    if stream >= SPAWN_STREAMS and not mers:
+        # jumping any further wraps around to trial 0's stream
+        raise ValueError(f'trial {t} is past the {max_trials(antithetic)} trials rand48 has streams for')
+    base = RandomNumberGenerator(buffer=buffer)
+    # scrambled, so small seeds (0 in particular) don't start from a degenerate state
+    base.seed(derive_seed(seed, 0))
+    rng = base.jumped(stream * SPAWN_STRIDE)
+    rng.antithetic = antithetic and t % 2 == 1
+    random.seed(derive_seed(seed, t))
     # if mersenne twister was specified
-    if args.mers:
-        if args.seed:
-            random.seed(args.seed)
+    if mers:
         rng.override_rand(random.random) 
+    return rng
+
+def trial_metrics(system_clock):
+    """
+    the per-trial results --ci-target can be asked to pin down; averages of
+    a process type that completed nothing (after the warm-up) are None,
+    the trial has no observation of them
+    """
+    # finalize leaves out the warm-up, if it was detected
+    system_clock.finalize()
+    metrics = {'processes_completed':system_clock.processes_completed}
+    for ptype, stats in system_clock.process_stats.items():
+        metrics[f'wait_time:{ptype}'] = stats.get('average_wait_time')
+        metrics[f'turnaround:{ptype}'] = stats.get('average_turnaround')
+    return metrics
+
+def trial_intervals(args, results):
+    """
+    confidence intervals of the --ci-metrics over the trials run so far
+    args:
+        :args (argparse.Namespace) - the run's arguments
+        :results (list) - trial_metrics of trials 0, 1, ...
+    returns:
+        :dict metric -> (observations, mean, half width), empty before there
+         are 2 trials; trials without a value of a metric are left out of
+         it, and a metric with fewer than 2 observations gets (n, nan, inf)
+    """
+    samples = results
+    if args.antithetic:
+        # an antithetic pair is one observation, if both halves have the metric
+        samples = [{m:None if a[m] is None or b[m] is None else (a[m] + b[m]) / 2 for m in a}
+                   for a, b in zip(results[::2], results[1::2])]
+    if len(samples) < 2:
+        return {}
+    intervals = dict()
+    for metric in samples[0]:
+        if metric.split(':')[0] in args.ci_metrics:
+            x = [r[metric] for r in samples if r[metric] is not None]
+            if len(x) < 2:
+                intervals[metric] = (len(x), float('nan'), float('inf'))
+                continue
+            m, hw = confidence_interval(x, level=args.ci_level)
+            intervals[metric] = (len(x), m, hw)
+    return intervals
+
+def precise_enough(args, intervals):
+    return bool(intervals) and all(hw <= args.ci_target * abs(m) for _, m, hw in intervals.values())
+
+def report_intervals(args, intervals):
+    lines = ['{:.0%} confidence intervals (target half width {:.2%} of the mean):'.format(args.ci_level, args.ci_target)]
+    for metric, (n, m, hw) in intervals.items():
+        rel = hw / abs(m) if n > 1 and m else float('inf')
+        lines.append('  {:<28} n={:<4} {:12.4f} +/- {:<12.4f} ({:.2%}){}'.format(
+                     metric, n, m, hw, rel, '' if rel <= args.ci_target else '  [not met]'))
+    report = '\n'.join(lines)
+    print(report)
+    if args.output is not None:
+        with open(os.path.join(args.output, 'confidence_intervals.txt'), 'w') as txt:
+            print(report, file=txt)
+
+def run_until_precise(args, results, first_trial):
+    """
+    run trials a batch at a time until precise_enough or out of trials
+    args:
+        :args (argparse.Namespace) - the run's arguments
+        :results (list) - trial_metrics of the trials before first_trial
+        :first_trial (int) - the next trial to run
+    """
+    batch = args.workers + (args.workers % 2 if args.antithetic else 0)
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        t = first_trial
+        while t < args.num_trials and not precise_enough(args, trial_intervals(args, results)):
+            trials = range(t, min(t + batch, args.num_trials))
+            if pool is None:
+                results.extend(main(args, t=trial) for trial in trials)
+            else:
+                results.extend(done.result() for done in [pool.submit(main, args, t=trial) for trial in trials])
+            t = trials.stop
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    report_intervals(args, trial_intervals(args, results))
+
+def resume_trial(args, t, checkpoints):
+    """
+    run trial t of a resumed run, from its checkpoint if it has one
+    """
+    if t in checkpoints:
+        return main(args, t=t, checkpoint=load_checkpoint(checkpoints[t]))
+    return main(args, t=t)
+
+def resume(args, checkpoint, path):
+    """
+    finish the trials of an interrupted run; with --workers several trials
+    run at once, so any of them may be finished (it has a pickle),
+    interrupted (it has a checkpoint) or not started, whichever one the
+    --resume checkpoint belongs to
+    args:
+        :args (argparse.Namespace) - the run's arguments
+        :checkpoint (dict) - the checkpoint passed to --resume
+        :path (str) - where it was read from
+    returns:
+        :trial_metrics of trials 0, 1, ... up to the last one started;
+         with --ci-target run_until_precise carries on from there
+    """
+    pickles = os.path.join(args.output, 'pickles', 'DiscreteEventSimulator_Trial{:03d}.bin')
+    checkpoints = os.path.join(args.output, 'checkpoints', 'DES_Checkpoint_trial{:03d}.bin')
+    trials = range(args.num_trials)
+    done = {t for t in trials if os.path.exists(pickles.format(t))}
+    checkpoints = {t:checkpoints.format(t) for t in trials
+                   if t not in done and os.path.exists(checkpoints.format(t))}
+    checkpoints[checkpoint['trial']] = path
+    if args.ci_target is not None:
+        trials = range(max(done | set(checkpoints)) + 1)
+    todo = [t for t in trials if t not in done]
+    print(f'[*] resuming {len(checkpoints)} checkpointed trial(s), rerunning {len(todo) - len(checkpoints)}, '
+          f'{len(done)} already finished')
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            pending = {t:pool.submit(resume_trial, args, t, checkpoints) for t in todo}
+            ran = {t:future.result() for t, future in pending.items()}
+    else:
+        ran = {t:resume_trial(args, t, checkpoints) for t in todo}
+    results = []
+    if args.ci_target is not None:
+        for t in trials:
+            if t not in ran:
+                with open(pickles.format(t), 'rb') as pkl:
+                    ran[t] = trial_metrics(pickle.load(pkl))
+            results.append(ran[t])
+    return results
+
+def main(args,t=0,checkpoint=None):
+    if checkpoint is not None:
+        # pick up exactly where the checkpointed run left off
+        rng = checkpoint['simulator'].factory.rng
+        random.setstate(checkpoint['random_state'])
+        if rng.override:
+            rng.override_rand(random.random)
+    else:
+        rng = trial_rng(args.seed, t, mers=args.mers, buffer=args.rng_buffer, antithetic=args.antithetic)
     args.rng = rng
     if args.verbose > 0:
         def pprint(x, i=0):
@@ -173,14 +492,42 @@ def main(args,t=0):
         def pprint(x,i=0):
             pass
     try:
-        des_params = {arg:getattr(args, arg) for arg in vars(args) if arg in DiscreteEventSimulator.params}
-        system_clock = DiscreteEventSimulator(**des_params)
-        system_clock.initialize()
-        ev = 0
-        while system_clock < system_clock.STOPTIME:
-            occurred = system_clock.handle_event()
-            pprint(occurred, i=ev)
-            ev+=1
+        if checkpoint is not None:
+            system_clock = checkpoint['simulator']
+            ev = checkpoint['events']
+            if system_clock.trace is not None:
+                # overwrite whatever was traced after the checkpoint
+                system_clock.trace.reopen()
+        else:
+            des_params = {arg:getattr(args, arg) for arg in vars(args) if arg in DiscreteEventSimulator.params}
+            if args.trace:
+                des_params['trace'] = os.path.join(args.output, 'traces', 'DES_Trace_trial{:03d}.bin'.format(t))
+            else:
+                des_params.pop('trace', None)
+            system_clock = DiscreteEventSimulator(**des_params)
+            system_clock.initialize()
+            ev = 0
+        checkpointer = None
+        if args.checkpoint_every or args.checkpoint_interval:
+            checkpointer = Checkpointer(os.path.join(args.output, 'checkpoints', 'DES_Checkpoint_trial{:03d}.bin'.format(t)),
+                                        every=args.checkpoint_every, seconds=args.checkpoint_interval)
+        # the event loop builds no reference cycles; with --pause-gc skip the collector passes
+        if args.pause_gc:
+            gc.disable()
+        try:
+            while system_clock < system_clock.STOPTIME:
+                occurred = system_clock.handle_event()
+                pprint(occurred, i=ev)
+                ev+=1
+                if checkpointer is not None and checkpointer.due(ev):
+                    checkpointer.write(ev, {'args':args, 'trial':t, 'events':ev,
+                                            'simulator':system_clock,
+                                            'random_state':random.getstate()})
+        finally:
+            if args.pause_gc:
+                gc.enable()
+            if checkpointer is not None:
+                checkpointer.finish()
         pprint(None)
         print()
         if args.output is not None:
@@ -192,12 +539,230 @@ def main(args,t=0):
             print(system_clock)
             with open(os.path.join(args.output,'trials','DES_Summary_trial{:03d}.txt'.format(t)),'w') as txt:
                 print(system_clock, file=txt)
+        return trial_metrics(system_clock)
 
     except KeyboardInterrupt:
         print('\n')
         print(system_clock)
         raise KeyboardInterrupt
 
+def parse_sweep_args():
+    D = 'Parameter sweep: run every configuration x trial and index the results'
+    parser = argparse.ArgumentParser(prog='simulator.py sweep', description=D)
+    parser.add_argument('--procgen-file','-f',
+                        dest='procgen',
+                        nargs='+',
+                        default=['pg.txt'],
+                        type=exists,
+                        help='Process description files to sweep over')
+
+    parser.add_argument('--quantum','-q',
+                        dest='quantum',
+                        nargs='+',
+                        default=[validquantum(0)],
+                        type=validquantum,
+                        help='Quantums to sweep over (same encoding as simulator.py -q)')
+
+    parser.add_argument('--num-cpus','-c',
+                        dest='num_cpus',
+                        nargs='+',
+                        default=[1],
+                        type=natural_num_gt0,
+                        help='CPU counts to sweep over')
+
+    parser.add_argument('--switch-time','-w',
+                        dest='ctx_switch',
+                        nargs='+',
+                        default=[0],
+                        type=natural_num_inc0,
+                        help='Context switch costs to sweep over')
+
+    parser.add_argument('--io',
+                        dest='enable_io',
+                        nargs='+',
+                        default=['on'],
+                        choices=['on','off'],
+                        help='Whether I/O faults are enabled; give both to sweep over it')
+
+    parser.add_argument('--list',
+                        dest='as_list',
+                        action='store_true',
+                        default=False,
+                        help='Pair the values up position by position instead of taking '+
+                             'every combination; single values are reused for every configuration')
+
+    parser.add_argument('--stop-time','-t',
+                        dest='stop_time',
+                        type=natural_num_gt0,
+                        default=100,
+                        help='Simulation stop time')
+
+    parser.add_argument('--num-trials','-N',
+                        dest='num_trials',
+                        default=1,
+                        type=natural_num_gt0,
+                        help='number of trials per configuration')
+
+    parser.add_argument('--seed','-s',
+                        dest='seed',
+                        type=int,
+                        default=0,
+                        help='Base seed; trial t of every configuration uses the same derived seed')
+
+    parser.add_argument('--common-random-numbers','-crn',
+                        dest='common_random_numbers',
+                        action='store_true',
+                        default=False,
+                        help='draw each attribute of each process type from its own substream, '+
+                             'so runs with the same seed see the same workload whatever the scheduling '+
+                             '(rand48 only, so not with -m)')
+
+    parser.add_argument('--antithetic',
+                        dest='antithetic',
+                        action='store_true',
+                        default=False,
+                        help='run trials in antithetic pairs: odd trials draw 1 - u where '+
+                             'the trial before them drew u (rand48 only, so not with -m)')
+
+    parser.add_argument('--workers',
+                        dest='workers',
+                        default=1,
+                        type=natural_num_gt0,
+                        help='number of trials to run in parallel')
+
+    parser.add_argument('--output-directory','-o',
+                        dest='output',
+                        required=True,
+                        help='results directory; rerunning into the same directory '+
+                             'skips the trials that already finished')
+    return parser
+
+def sweep_configs(args):
+    """
+    the configurations described by the sweep arguments
+    """
+    axes = [args.procgen, args.quantum, args.num_cpus, args.ctx_switch, args.enable_io]
+    if args.as_list:
+        n = max(len(axis) for axis in axes)
+        if any(len(axis) not in (1, n) for axis in axes):
+            raise ValueError(f'--list needs every parameter to have 1 or {n} values')
+        combos = zip(*(axis * n if len(axis) == 1 else axis for axis in axes))
+    else:
+        combos = itertools.product(*axes)
+    configs = []
+    for procgen, quantum, num_cpus, ctx_switch, io in combos:
+        configs.append({'procgen':procgen, 'quantum':quantum, 'num_cpus':num_cpus,
+                        'ctx_switch':ctx_switch, 'enable_io':io == 'on'})
+    return configs
+
+def config_dir(output, config):
+    """
+    where a configuration's pickles/ and trials/ go; laid out the way
+    batch_simulate.sh does, so analysis.py can read sweeps directly
+    """
+    stem = os.path.splitext(os.path.basename(config['procgen']))[0]
+    parent = f"{stem}_{config['num_cpus']}cpu_w{config['ctx_switch']}" + ('' if config['enable_io'] else '_noio')
+    if config['quantum'][0] == 'r':
+        return os.path.join(output, parent, 'DES_RL')
+    return os.path.join(output, parent, 'DESQuantum__{:04d}'.format(config['quantum'][1]))
+
+def open_results(output):
+    """
+    open (creating if needed) the sqlite index of a sweep's results;
+    directories are stored relative to the output directory, so the
+    index survives the tree being moved or named differently
+    """
+    db = sqlite3.connect(os.path.join(output, 'results.db'))
+    db.execute('CREATE TABLE IF NOT EXISTS runs ('
+               'directory TEXT, trial INTEGER, procgen TEXT, quantum TEXT, num_cpus INTEGER, '
+               'ctx_switch INTEGER, enable_io INTEGER, stop_time INTEGER, seed INTEGER, '
+               'crn INTEGER, antithetic INTEGER, '
+               'simulation_length INTEGER, processes_completed INTEGER, events_processed INTEGER, '
+               'avg_rq_len REAL, avg_eq_len REAL, stats TEXT, '
+               'PRIMARY KEY (directory, trial))')
+    if 'crn' not in [column[1] for column in db.execute('PRAGMA table_info(runs)')]:
+        sys.exit(f'[!] {output} holds results from an older sweep; use a new output directory')
+    return db
+
+def sweep_trial(config, t, output, directory, stop_time, seed, crn=False, antithetic=False):
+    """
+    run one trial of one configuration; writes its pickle and summary
+    like main does and returns the row for the results index
+    args:
+        :output (str) - the sweep's output directory
+        :directory (str) - the configuration's directory, relative to output
+    """
+    des_params = dict(config, stop_time=stop_time, common_random_numbers=crn,
+                      rng=trial_rng(seed, t, antithetic=antithetic))
+    system_clock = DiscreteEventSimulator(**des_params)
+    system_clock.initialize()
+    while system_clock < system_clock.STOPTIME:
+        system_clock.handle_event()
+    summary = system_clock.summarize()
+    with open(os.path.join(output, directory, 'pickles','DiscreteEventSimulator_Trial{:03d}.bin'.format(t)),'wb') as pkl:
+        pickle.dump(system_clock, pkl)
+    with open(os.path.join(output, directory,'trials','DES_Summary_trial{:03d}.txt'.format(t)),'w') as txt:
+        print(summary, file=txt)
+
+    # completions after the warm-up; means are null for a type without any
+    stats = {ptype:{'completed':system_clock.process_stats[ptype]['counted'],
+                    'mean_wait_time':system_clock.process_stats[ptype].get('average_wait_time'),
+                    'mean_turnaround':system_clock.process_stats[ptype].get('average_turnaround')}
+             for ptype in system_clock.factory.process_types}
+    stats['cpus'] = [{'active_time':cpu.active_time, 'idle_time':cpu.idle_time,
+                      'context_switch_time':cpu.context_switch_time} for cpu in system_clock.CPUs]
+    return (directory, t, config['procgen'], '{}{}'.format(*config['quantum']), config['num_cpus'],
+            config['ctx_switch'], int(config['enable_io']), stop_time, seed, int(crn), int(antithetic),
+            system_clock.SIMULATION_LEN, system_clock.processes_completed, system_clock.events_processed,
+            system_clock.avg_rq_len, system_clock.avg_eq_len, json.dumps(stats))
+
+def sweep(args):
+    """
+    run every configuration x trial of a sweep across a process pool,
+    skipping the ones already in the results index; refuses to add to an
+    index made with a different stop time, seed or random number scheme
+    """
+    os.makedirs(args.output, exist_ok=True)
+    db = open_results(args.output)
+    settings = (args.stop_time, args.seed, int(args.common_random_numbers), int(args.antithetic))
+    recorded = set(db.execute('SELECT DISTINCT stop_time, seed, crn, antithetic FROM runs'))
+    if recorded - {settings}:
+        db.close()
+        sys.exit(f'[!] {args.output} holds results for (stop time, seed, crn, antithetic) = ' +
+                 ', '.join(map(str, sorted(recorded))) + f', not {settings}; use a new output directory')
+    finished = set(db.execute('SELECT directory, trial FROM runs'))
+    # results are keyed on the directory, so two configurations sharing
+    # one (procgen files with the same name) would overwrite each other
+    directories = dict()
+    for config in sweep_configs(args):
+        directory = os.path.relpath(config_dir(args.output, config), args.output)
+        other = directories.setdefault(directory, config)
+        if dict(other, procgen=os.path.realpath(other['procgen'])) != \
+           dict(config, procgen=os.path.realpath(config['procgen'])):
+            db.close()
+            sys.exit(f'[!] {other["procgen"]} and {config["procgen"]} would both go to {directory}; '
+                     'give the procgen files different names')
+    jobs = []
+    for directory, config in directories.items():
+        os.makedirs(os.path.join(args.output, directory, 'pickles'), exist_ok=True)
+        os.makedirs(os.path.join(args.output, directory, 'trials'), exist_ok=True)
+        for t in range(args.num_trials):
+            if (directory, t) not in finished:
+                jobs.append((config, t, directory))
+    print(f'[*] {len(jobs)} trials to run, {len(finished)} already finished')
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pending = [pool.submit(sweep_trial, config, t, args.output, directory, args.stop_time, args.seed,
+                               args.common_random_numbers, args.antithetic)
+                   for config, t, directory in jobs]
+        for i, done in enumerate(as_completed(pending), 1):
+            row = done.result()
+            # only the parent writes the index; a row means the trial's files are complete
+            db.execute('INSERT OR REPLACE INTO runs VALUES ({})'.format(','.join('?' * len(row))), row)
+            db.commit()
+            print(f'\r[{i}/{len(jobs)}] {row[0]} trial {row[1]}', end='', flush=True)
+    print()
+    db.close()
+
 #def plot(self):
 #    """
 #    plot throughput over time, histogram of time quantums per process
@@ -208,22 +773,71 @@ def main(args,t=0):
 #       pass 
 
 if __name__ == '__main__':
-    args = parse_args().parse_args()
-    os.makedirs(os.path.join(args.output, 'pickles'))
-    os.makedirs(os.path.join(args.output, 'trials'))
+    if sys.argv[1:2] == ['sweep']:
+        parser = parse_sweep_args()
+        args = parser.parse_args(sys.argv[2:])
+        if args.num_trials > max_trials(args.antithetic):
+            parser.error(f'-N can be at most {max_trials(args.antithetic)}; rand48 has no more trial streams')
+        try:
+            sweep(args)
+        except KeyboardInterrupt:
+            print('\n[X] Quitting',file=sys.stderr)
+        sys.exit()
+    parser = parse_args()
+    args = parser.parse_args()
+    if args.mers and (args.antithetic or args.common_random_numbers):
+        # both are built on rand48 streams; the mersenne twister has neither
+        parser.error('--antithetic and --common-random-numbers only work with rand48, not -m')
+    if args.num_trials > max_trials(args.antithetic) and not args.mers:
+        parser.error(f'-N can be at most {max_trials(args.antithetic)}; rand48 has no more trial streams')
+    checkpoint = None
+    resume_path = args.resume
+    if args.resume is not None:
+        checkpoint = load_checkpoint(args.resume)
+        saved = checkpoint['args']
+        # options newer than the checkpoint take their value from this invocation
+        for arg, value in vars(args).items():
+            if not hasattr(saved, arg):
+                setattr(saved, arg, value)
+        args = saved
+    elif (args.checkpoint_every or args.checkpoint_interval) and args.output is None:
+        parser.error('checkpointing needs an output directory (-o)')
+    elif args.trace and args.output is None:
+        parser.error('--trace needs an output directory (-o)')
+    os.makedirs(os.path.join(args.output, 'pickles'), exist_ok=checkpoint is not None)
+    os.makedirs(os.path.join(args.output, 'trials'), exist_ok=checkpoint is not None)
+    if args.checkpoint_every or args.checkpoint_interval:
+        os.makedirs(os.path.join(args.output, 'checkpoints'), exist_ok=True)
+    if args.trace:
+        os.makedirs(os.path.join(args.output, 'traces'), exist_ok=True)
     try:
-        # the random number generator for the simulation
-        rng = RandomNumberGenerator(seed=args.seed)
-        # filter out arguments we don't need, initialize the clock
-        args.enable_io = not args.disable_io
-        if args.output is not None:
-            summarize_arguments(args)
+        if checkpoint is None:
+            # trial random number generators are derived from the seed;
+            # pick one from the clock if none was given so it gets recorded
+            if args.seed is None:
+                args.seed = int(time.time())
+            # filter out arguments we don't need, initialize the clock
+            args.enable_io = not args.disable_io
+            if args.output is not None:
+                summarize_arguments(args)
     except KeyboardInterrupt:
         print('\n[X] Quitting',file=sys.stderr)
     
     try:
-        for trial in range(args.num_trials):
-            main(args, t=trial)
+        trials = range(args.num_trials)
+        results = []
+        if checkpoint is not None:
+            results = resume(args, checkpoint, resume_path)
+            trials = range(len(results), args.num_trials) if args.ci_target is not None else range(0)
+        if args.ci_target is not None:
+            run_until_precise(args, results, trials.start)
+        elif args.workers > 1:
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                for done in [pool.submit(main, args, t=trial) for trial in trials]:
+                    done.result()
+        else:
+            for trial in trials:
+                main(args, t=trial)
     except KeyboardInterrupt:
         print('\n[X] Quitting',file=sys.stderr)
 